@@ -37,10 +37,30 @@ INSTALLED_APPS = [
 # REST framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',  # JWT-based authentication
+        'cinearcapp.authentication.CachedJWTAuthentication',  # JWT-based authentication, users resolved from the cache
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'cinearcapp.renderers.ORJSONRenderer',  # orjson instead of the stdlib json module
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'cinearcapp.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    'DEFAULT_PAGINATION_CLASS': 'cinearcapp.pagination.KeysetPagination',  # Cursor pagination on every list
+    'PAGE_SIZE': int(os.getenv("API_PAGE_SIZE", "50")),  # Default number of items per page
+    'DEFAULT_THROTTLE_RATES': {
+        # Token bucket per scope (cinearcapp.throttling): burst size / refill period
+        'login': os.getenv("THROTTLE_LOGIN", "10/min"),  # Per IP, password hashing is expensive
+        'register': os.getenv("THROTTLE_REGISTER", "5/hour"),  # Per IP
+        'checkout': os.getenv("THROTTLE_CHECKOUT", "10/min"),  # Per user, each call reaches the payment provider
+    },
 }
 
+# Upper bound for the `page_size` query parameter
+MAX_PAGE_SIZE = int(os.getenv("API_MAX_PAGE_SIZE", "200"))
+
 # JWT configuration
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=15),  # Access token validity
@@ -97,6 +117,11 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',  # Default SQLite database
         'NAME': BASE_DIR / 'db.sqlite3',  # SQLite database file
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',  # Take the write lock when a transaction starts
+        },
+        # A file, so concurrent test requests wait for the write lock (a shared in-memory database fails instead)
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     },
     "server": {
         "ENGINE": "django.db.backends.postgresql",  # PostgreSQL database
@@ -105,9 +130,37 @@ DATABASES = {
         "PASSWORD": os.getenv("POSTGRES_PASSWORD"),  # Database password
         "HOST": os.getenv("POSTGRES_HOST"),  # Database host
         "PORT": os.getenv("POSTGRES_PORT"),  # Database port
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", "60")),  # Keep connections open between requests
+        "CONN_HEALTH_CHECKS": True,  # Check a reused connection before the request uses it
     }
 }
 
+# Run on the PostgreSQL server: transactions and writes go through the "default" alias
+if os.getenv("DATABASE") == "server":
+    DATABASES["default"] = DATABASES["server"]
+
+# Read replicas of the server, e.g. POSTGRES_REPLICA_HOSTS="replica1.db,replica2.db:5433"
+for index, host in enumerate(filter(None, os.getenv("POSTGRES_REPLICA_HOSTS", "").split(",")), start=1):
+    hostname, _, port = host.strip().partition(":")
+    DATABASES[f"replica{index}"] = {
+        **DATABASES["server"],
+        "HOST": hostname,
+        "PORT": port or DATABASES["server"]["PORT"],
+        "TEST": {"MIRROR": "default"},  # The tests read the test database through the replica aliases
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias.startswith("replica")]
+
+# Catalog reads go to the replicas, everything else to "default" (cinearcapp.routers)
+DATABASE_ROUTERS = ["cinearcapp.routers.PrimaryReplicaRouter"]
+# Seconds after a catalog change during which its reads stay on the primary (replication lag)
+REPLICA_LAG_TOLERANCE = int(os.getenv("DB_REPLICA_LAG_TOLERANCE", "5"))
+
+# Login with the email address (API), or the username (admin)
+AUTHENTICATION_BACKENDS = [
+    "cinearcapp.backends.EmailBackend",
+    "django.contrib.auth.backends.ModelBackend",
+]
+
 # Password validation configuration
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},  # Prevent passwords similar to user attributes
@@ -136,3 +189,42 @@ CELERY_ACCEPT_CONTENT = ["json"]  # Accepted content types
 CELERY_TASK_SERIALIZER = "json"  # Task serialization format
 CELERY_SEND_EVENTS = True  # Enable event sending
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"  # Scheduler for periodic tasks
+
+# Cache configuration: Redis when available, local memory otherwise (development, tests)
+CACHE_URL = os.getenv("CACHE_URL", os.getenv("REDIS_URL"))
+if CACHE_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",  # Shared Redis cache
+            "LOCATION": CACHE_URL,
+            "KEY_PREFIX": "cinearc",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",  # Per-process fallback
+        }
+    }
+
+# Throttle buckets are kept in Redis when available, in memory otherwise (development, tests)
+THROTTLE_REDIS_URL = CACHE_URL
+
+# Lifetime of the cached catalog responses (seconds), invalidation is signal driven
+CATALOG_CACHE_TIMEOUT = int(os.getenv("CATALOG_CACHE_TIMEOUT", str(60 * 60 * 24)))
+
+# Lifetime of the users cached by the JWT authentication (seconds), invalidated when a user is saved
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv("AUTH_USER_CACHE_TIMEOUT", "300"))
+
+# Seat holds: unpaid basket lines keep their seats for this long (minutes)
+BASKET_HOLD_MINUTES = int(os.getenv("BASKET_HOLD_MINUTES", "15"))
+BASKET_SWEEP_BATCH_SIZE = int(os.getenv("BASKET_SWEEP_BATCH_SIZE", "1000"))  # Expired lines released per transaction
+
+# Payments: "stripe" in production, "fake" runs an in-process provider (tests, development)
+PAYMENT_PROVIDER = os.getenv("PAYMENT_PROVIDER", "stripe")
+STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
+STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")  # Signing secret of the webhook endpoint
+STRIPE_TIMEOUT = (float(os.getenv("STRIPE_CONNECT_TIMEOUT", "3")), float(os.getenv("STRIPE_READ_TIMEOUT", "10")))  # Seconds
+STRIPE_MAX_NETWORK_RETRIES = int(os.getenv("STRIPE_MAX_NETWORK_RETRIES", "2"))  # Safe thanks to the idempotency keys
+PAYMENT_CURRENCY = "chf"
+CHECKOUT_EXPIRY_MINUTES = int(os.getenv("CHECKOUT_EXPIRY_MINUTES", "60"))  # Stripe accepts 30 minutes to 24 hours
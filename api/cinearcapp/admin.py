@@ -1,10 +1,11 @@
 from django.contrib import admin
-from .models import Movie, Session, Room, Basket
+from .models import Movie, Session, Room, Basket, Genre, Order, OrderLine
 
 #Register your models here.
 admin.site.register(Movie)
 admin.site.register(Session)
 admin.site.register(Room)
 admin.site.register(Basket)
-
-
+admin.site.register(Genre)
+admin.site.register(Order)
+admin.site.register(OrderLine)
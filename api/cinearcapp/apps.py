@@ -6,3 +6,7 @@ class CinearcappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     # Defines the name of the application
     name = 'cinearcapp'
+
+    def ready(self):
+        # Connect the signal handlers (catalog cache invalidation)
+        from . import signals  # noqa: F401
@@ -0,0 +1,206 @@
+"""
+Native async read views for the busiest endpoints, next to the DRF viewsets.
+
+Under ASGI they run on the event loop instead of taking a thread of the sync_to_async
+pool for the whole request. They render the same representations as the viewsets
+(compact lists, full details) and share their cache entries' versions and replicas.
+"""
+import hashlib
+import logging
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from rest_framework.exceptions import APIException
+from .authentication import CachedJWTAuthentication
+from .cache import get_stamps, replica_lag_slot
+from .fieldsets import apply_query_plan
+from .holds import annotate_expired_seats
+from .models import Movie, Session
+from .renderers import ORJSONRenderer
+from .routers import replica_reads
+from .serializers import MovieSerializer, SessionSerializer
+
+logger = logging.getLogger(__name__)
+
+renderer = ORJSONRenderer()
+authenticator = CachedJWTAuthentication()
+
+
+def json_response(data, status=200):
+    return HttpResponse(renderer.render(data), status=status, content_type="application/json")
+
+
+def not_found():
+    return json_response({"detail": "Not found."}, status=404)
+
+
+def get_page_size(request):
+    """
+    `?page_size=`, bounded like the viewsets' pagination.
+    """
+    value = request.GET.get("page_size", "")
+    size = int(value) if value.isdigit() and int(value) > 0 else settings.REST_FRAMEWORK["PAGE_SIZE"]
+    return min(size, settings.MAX_PAGE_SIZE)
+
+
+def next_link(request, after):
+    params = request.GET.copy()
+    params["after"] = after
+    return request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+
+
+def cache_lookup(request, tables, period, lagging):
+    """
+    Versions, conditional GET and cached data of a response, like
+    CachedResponseMixin.cached_response. Sync, so that the async views pay a single
+    thread hop for all the cache round trips.
+    Returns (digest, last modified time or None, cache timeout, replica allowed,
+    304 response or None, cached data or None).
+    """
+    versions, last_modified = get_stamps(*tables)
+    # Same rule as routers.replica_allowed, from the stamps already read
+    use_replica = bool(settings.DATABASE_REPLICAS) and time.time() - last_modified >= settings.REPLICA_LAG_TOLERANCE
+    lag_slot = None
+    if lagging:
+        lag_versions, lag_modified = get_stamps(*lagging)
+        versions += lag_versions
+        last_modified = max(last_modified, lag_modified)
+        lag_slot = replica_lag_slot(lag_modified)
+    if period:
+        versions.append(int(time.time() // period))
+        last_modified = max(last_modified, versions[-1] * period)
+    timeout = settings.CATALOG_CACHE_TIMEOUT
+    if lag_slot is not None:
+        versions.append(f"lag:{lag_slot}")
+        timeout, last_modified = settings.REPLICA_LAG_TOLERANCE, None
+
+    parts = ["async", request.get_full_path()] + [str(version) for version in versions]
+    digest = hashlib.sha1(":".join(parts).encode()).hexdigest()
+
+    not_modified = get_conditional_response(request, etag=f'"{digest}"', last_modified=last_modified)
+    if not_modified is not None:
+        return digest, last_modified, timeout, use_replica, not_modified, None
+    return digest, last_modified, timeout, use_replica, None, cache.get(f"catalog:response:{digest}")
+
+
+async def cached_json(request, tables, build, period=None, lagging=()):
+    """
+    Serve the data returned by the `build` coroutine (None for a 404) from the catalog
+    cache, keyed by the versions of `tables` and `lagging`, with ETag and conditional GET.
+    `period` and `lagging` work like CachedResponseMixin.cache_period and lagging_tables.
+    Reads go to the replicas when allowed.
+    """
+    try:
+        digest, last_modified, timeout, use_replica, not_modified, data = await sync_to_async(cache_lookup)(
+            request, tables, period, lagging
+        )
+    except Exception:
+        logger.exception("Catalog cache unavailable")
+        data = await build()
+        return not_found() if data is None else json_response(data)
+    if not_modified is not None:
+        return not_modified
+
+    if data is None:
+        if use_replica:
+            with replica_reads():
+                data = await build()
+        else:
+            data = await build()
+        if data is None:
+            return not_found()
+        try:
+            await cache.aset(f"catalog:response:{digest}", data, timeout)
+        except Exception:
+            logger.exception("Catalog cache unavailable")
+
+    response = json_response(data)
+    response["ETag"] = f'"{digest}"'
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    response["Cache-Control"] = "no-cache"
+    return response
+
+
+@require_safe
+async def movie_list(request):
+    """
+    Compact movie list in id order, `?after=<id>` for the next page.
+    """
+    async def build():
+        size = get_page_size(request)
+        queryset = Movie.objects.order_by("id")
+        after = request.GET.get("after", "")
+        if after.isdigit():
+            queryset = queryset.filter(id__gt=int(after))
+        serializer = MovieSerializer(fields=MovieSerializer.compact_fields)
+        movies = [movie async for movie in apply_query_plan(queryset, serializer)[:size + 1]]
+        return {
+            "next": next_link(request, movies[size - 1].id) if len(movies) > size else None,
+            "results": MovieSerializer(movies[:size], many=True, fields=MovieSerializer.compact_fields).data,
+        }
+
+    return await cached_json(request, ("movie",), build)
+
+
+@require_safe
+async def movie_detail(request, pk):
+    async def build():
+        movie = await Movie.objects.prefetch_related("genres").filter(pk=pk).afirst()
+        return None if movie is None else MovieSerializer(movie).data
+
+    return await cached_json(request, ("movie",), build)
+
+
+@require_safe
+async def movie_sessions(request, pk):
+    """
+    Upcoming sessions of a movie in chronological order, with a compact movie and room.
+    `?after=<date_hour>,<id>` (the `next` link) for the next page.
+    """
+    async def build():
+        size = get_page_size(request)
+        queryset = Session.objects.filter(movie_id=pk, date_hour__gte=timezone.now()).order_by("date_hour", "id")
+        date_hour, _, session_id = request.GET.get("after", "").rpartition(",")
+        date_hour = parse_datetime(date_hour) if date_hour else None
+        if date_hour is not None and session_id.isdigit():
+            queryset = queryset.filter(Q(date_hour__gt=date_hour) | Q(date_hour=date_hour, id__gt=int(session_id)))
+        serializer = SessionSerializer(expand=[])
+        queryset = annotate_expired_seats(apply_query_plan(queryset, serializer))
+        sessions = [session async for session in queryset[:size + 1]]
+        last = sessions[size - 1] if len(sessions) > size else None
+        return {
+            "next": next_link(request, f"{last.date_hour.isoformat()},{last.id}") if last else None,
+            "results": SessionSerializer(sessions[:size], many=True, expand=[]).data,
+        }
+
+    # The list hides sessions as they start, like the session viewset
+    return await cached_json(request, ("session", "movie", "room"), build, period=60, lagging=("seats",))
+
+
+@require_safe
+async def current_user(request):
+    """
+    The logged-in user, authenticated with the JWT like the sync API.
+    """
+    try:
+        result = await sync_to_async(authenticator.authenticate)(request)
+    except APIException as exc:
+        result, detail = None, exc.detail
+    else:
+        detail = "Authentication credentials were not provided."
+    if result is None:
+        response = json_response({"detail": detail}, status=401)
+        response["WWW-Authenticate"] = authenticator.authenticate_header(request)
+        return response
+
+    user, _ = result
+    return json_response({"id": user.id, "username": user.username, "email": user.email, "is_superuser": user.is_superuser})
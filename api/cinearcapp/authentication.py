@@ -0,0 +1,69 @@
+import logging
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from .cache import get_stamps
+
+logger = logging.getLogger(__name__)
+
+# Cached users, keyed by id and by the version stamp bumped when the user is saved
+USER_KEY = "auth:user:{user_id}:{version}"
+
+
+def user_stamp(user_id):
+    """
+    Name of the version stamp of one user, bumped by the User signals.
+    """
+    return f"user:{user_id}"
+
+
+def user_stamp_timeout():
+    """
+    Lifetime of the user stamps. Unlike the catalog stamps there is one per user, so
+    they must expire; they only need to outlive the users cached under them.
+    """
+    return 2 * settings.AUTH_USER_CACHE_TIMEOUT
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that resolves the user from the cache instead of the database.
+
+    Users are cached for AUTH_USER_CACHE_TIMEOUT seconds under their version stamp, so
+    saving or deleting a user (password change, deactivation...) makes the cached copy
+    unreachable at once. The token checks run on every request, cached or not.
+    When the cache backend is down, the user is loaded from the database.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)  # Rejects the token
+
+        try:
+            (version,), _ = get_stamps(user_stamp(user_id), timeout=user_stamp_timeout())
+            key = USER_KEY.format(user_id=user_id, version=version)
+            user = cache.get(key)
+        except Exception:
+            logger.exception("User cache unavailable")
+            return super().get_user(validated_token)
+
+        if user is None:
+            user = super().get_user(validated_token)  # Loads and checks the user
+            try:
+                cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+            except Exception:
+                logger.exception("User cache unavailable")
+            return user
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db.models.functions import Lower
+
+
+def users_by_email(email):
+    """
+    Users whose email matches `email`, case-insensitively.
+    Filters on LOWER(email) so the lookup uses the `auth_user_email_ci_uniq` index.
+    """
+    return get_user_model().objects.alias(email_lower=Lower("email")).filter(email_lower=email.strip().lower())
+
+
+class EmailBackend(ModelBackend):
+    """
+    Authenticate with the email address and the password, in a single indexed query.
+    """
+
+    def authenticate(self, request, email=None, password=None, **kwargs):
+        if not email or password is None:
+            return None
+        user = users_by_email(email).first()
+        if user is None:
+            # Hash anyway so that unknown emails take as long as wrong passwords
+            get_user_model()().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,165 @@
+import hashlib
+import logging
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+# Per-table stamps: an incrementing version and the time of the last change
+VERSION_KEY = "catalog:version:{table}"
+MODIFIED_KEY = "catalog:modified:{table}"
+
+
+def get_stamps(*tables, timeout=None):
+    """
+    Return the version of each table (in the given order) and the latest modification
+    time of all of them, in a single cache round trip.
+    Missing versions are initialised with the current time in milliseconds so that a
+    version evicted from the cache can never come back with an already used value.
+    Stamps created here live for `timeout` seconds (None: until evicted).
+    """
+    version_keys = [VERSION_KEY.format(table=table) for table in tables]
+    modified_keys = [MODIFIED_KEY.format(table=table) for table in tables]
+    stamps = cache.get_many(version_keys + modified_keys)
+
+    now = time.time()
+    for key in version_keys:
+        if key not in stamps:
+            cache.add(key, int(now * 1000), timeout=timeout)
+            stamps[key] = cache.get(key)
+    for key in modified_keys:
+        if key not in stamps:
+            cache.add(key, int(now), timeout=timeout)  # Unknown, assume it just changed
+            stamps[key] = cache.get(key)
+
+    versions = [stamps[key] for key in version_keys]
+    last_modified = max((stamps[key] for key in modified_keys), default=int(now))
+    return versions, last_modified
+
+
+def bump_version(table, timeout=None):
+    """
+    Invalidate every cached response built from `table`.
+    The bump runs after the current transaction commits, so a concurrent reader can't
+    cache the old rows under the new version.
+    `timeout` is the lifetime of the stamps, as in get_stamps.
+    """
+    def bump():
+        key = VERSION_KEY.format(table=table)
+        try:
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.add(key, int(time.time() * 1000), timeout=timeout)  # Stamp missing or evicted
+            cache.set(MODIFIED_KEY.format(table=table), int(time.time()), timeout=timeout)
+        except Exception:
+            logger.exception("Could not bump the cache version of %s", table)
+
+    transaction.on_commit(bump)
+
+
+def replica_lag_slot(last_modified):
+    """
+    While the replicas may still miss a change made at `last_modified` (see
+    REPLICA_LAG_TOLERANCE), the number of the current slot of REPLICA_LAG_TOLERANCE
+    seconds, None afterwards or without replicas.
+    """
+    now = time.time()
+    if not settings.DATABASE_REPLICAS or now - last_modified >= settings.REPLICA_LAG_TOLERANCE:
+        return None
+    return int(now // max(1, settings.REPLICA_LAG_TOLERANCE))
+
+
+class CachedResponseMixin:
+    """
+    Cache the list and retrieve responses of a read-mostly viewset, with conditional GET.
+
+    Cache keys and ETags embed the version stamps of `cache_tables`, so saving or
+    deleting a row of one of those tables makes every related entry unreachable at once.
+    Requests carrying a matching `If-None-Match` / `If-Modified-Since` get a 304 without
+    touching the database or the serializer.
+    When the cache backend is down, requests simply go to the database.
+
+    Changes of `lagging_tables` don't keep the reads on the primary (see
+    routers.ReplicaReadsMixin), so for REPLICA_LAG_TOLERANCE seconds after one the
+    data may come from a replica that doesn't have it yet: entries and ETags then only
+    last a slot of REPLICA_LAG_TOLERANCE seconds, without Last-Modified.
+    """
+    cache_tables = ()  # Tables the serialized data is built from
+    lagging_tables = ()  # Also in the data, but read from the replicas right after they change
+    cache_period = None  # When set, entries and ETags also roll over every `cache_period` seconds
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, super().retrieve, *args, **kwargs)
+
+    def get_response_digest(self, request, versions):
+        """
+        Identify one representation of one resource at the given table versions.
+        """
+        parts = [self.basename, self.action, request.accepted_renderer.format, request.get_full_path()]
+        parts += [str(version) for version in versions]
+        return hashlib.sha1(":".join(parts).encode()).hexdigest()
+
+    def cached_response(self, request, view, *args, **kwargs):
+        try:
+            versions, last_modified = get_stamps(*self.cache_tables)
+            lag_slot = None
+            if self.lagging_tables:
+                lag_versions, lag_modified = get_stamps(*self.lagging_tables)
+                versions += lag_versions
+                last_modified = max(last_modified, lag_modified)
+                lag_slot = replica_lag_slot(lag_modified)
+        except Exception:
+            logger.exception("Catalog cache unavailable")
+            return view(request, *args, **kwargs)
+
+        if self.cache_period:
+            period = int(time.time() // self.cache_period)
+            versions.append(period)
+            last_modified = max(last_modified, period * self.cache_period)
+
+        timeout = settings.CATALOG_CACHE_TIMEOUT
+        if lag_slot is not None:
+            versions.append(f"lag:{lag_slot}")
+            timeout = settings.REPLICA_LAG_TOLERANCE
+            last_modified = None  # A client copy from a lagging replica must not stay valid after the slot
+
+        digest = self.get_response_digest(request, versions)
+        etag = f'"{digest}"'
+
+        # Conditional GET: nothing to serialize when the client copy is current
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        key = f"catalog:response:{digest}"
+        try:
+            data = cache.get(key)
+        except Exception:
+            logger.exception("Catalog cache unavailable")
+            data = None
+
+        if data is not None:
+            response = Response(data)
+        else:
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            try:
+                cache.set(key, response.data, timeout)
+            except Exception:
+                logger.exception("Catalog cache unavailable")
+
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+        response["Cache-Control"] = "no-cache"  # Always revalidate with the ETag
+        return response
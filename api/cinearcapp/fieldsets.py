@@ -0,0 +1,102 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+
+def parse_names(value):
+    """
+    Split a comma-separated query parameter into names, None when it is absent.
+    """
+    if value is None:
+        return None
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+def query_plan(serializer, prefix=""):
+    """
+    Columns, select_related and prefetch_related paths needed to render `serializer`.
+
+    Relations nested through a serializer are followed, many-to-many fields are
+    prefetched and fields that are not model fields (annotations, properties) are skipped.
+    """
+    model = serializer.Meta.model
+    columns, select, prefetch = [prefix + model._meta.pk.name], [], []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        source = name if field.source == "*" else field.source  # Method fields read their own name
+        try:
+            model_field = model._meta.get_field(source)
+        except FieldDoesNotExist:
+            continue
+        if model_field.many_to_many or model_field.one_to_many:
+            prefetch.append(prefix + source)
+        elif model_field.many_to_one and isinstance(field, serializers.BaseSerializer):
+            nested = query_plan(field, f"{prefix}{source}__")
+            columns += [prefix + source] + nested[0]
+            select += [prefix + source] + nested[1]
+            prefetch += nested[2]
+        elif model_field.concrete:
+            columns.append(prefix + source)
+    return columns, select, prefetch
+
+
+def apply_query_plan(queryset, serializer, columns=()):
+    """
+    Load only what `serializer` renders (see query_plan), plus the extra `columns`.
+    """
+    needed, select, prefetch = query_plan(serializer)
+    queryset = queryset.select_related(None).prefetch_related(None).only(*needed, *columns)
+    if select:
+        queryset = queryset.select_related(*select)  # Without arguments, it would follow every relation
+    return queryset.prefetch_related(*prefetch)
+
+
+class SparseFieldsMixin:
+    """
+    Let the list and retrieve responses of a viewset pick their fields.
+
+    - `?fields=id,title` keeps only those fields (`?fields=all` keeps every field)
+    - `?expand=movie` embeds the full nested movie instead of its compact form
+    - lists default to `list_fields` and to compact nested objects, details to everything
+
+    The query follows the chosen representation: only() loads the rendered columns, and
+    the relations left out are neither joined nor prefetched.
+    """
+    list_fields = None  # Default fields of the list, None for all
+
+    def get_fieldset(self):
+        """
+        Fields and expanded relations of the response, None meaning all of them.
+        """
+        if self.action not in ("list", "retrieve"):
+            return None, None
+        params = self.request.query_params
+        fields, expand = parse_names(params.get("fields")), parse_names(params.get("expand"))
+        if fields == ["all"]:
+            fields = None
+        elif fields is None and self.action == "list":
+            fields = self.list_fields
+        if expand is None and self.action == "list":
+            expand = []  # Nested objects are compact in lists
+
+        available = self.get_serializer_class()().fields
+        unknown = sorted(set(fields or []) - set(available)) + sorted(set(expand or []) - set(available))
+        if unknown:
+            raise ValidationError({"fields": f"Unknown field(s): {', '.join(unknown)}."})
+        return fields, expand
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action in ("list", "retrieve"):
+            kwargs["fields"], kwargs["expand"] = self.get_fieldset()
+        return super().get_serializer(*args, **kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in ("list", "retrieve"):
+            return queryset
+        fields, expand = self.get_fieldset()
+        columns = []
+        if self.action == "list":
+            columns = [field.lstrip("-") for field in getattr(self.paginator, "ordering", ())]  # Read by the cursor
+        return apply_query_plan(queryset, self.get_serializer_class()(fields=fields, expand=expand), columns)
@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .cache import bump_version
+from .models import Basket, Session
+
+
+def annotate_expired_seats(queryset, now=None):
+    """
+    Annotate sessions with `expired_seats`, the seats of expired holds not swept yet.
+    Read lazily with the session, through the partial `basket_session_hold_idx` index,
+    so the displayed availability is right between two sweeps.
+    """
+    expired = (
+        Basket.objects.expired(now)
+        .filter(session=OuterRef("pk"))
+        .order_by()
+        .values("session")
+        .annotate(total=Sum("quantity"))
+        .values("total")
+    )
+    return queryset.annotate(expired_seats=Coalesce(Subquery(expired), 0))
+
+
+def release_expired_holds(queryset=None, batch_size=None, now=None):
+    """
+    Give back the seats of the unpaid basket lines whose hold has expired, and delete them.
+
+    Lines are read oldest expiry first through the partial `basket_hold_expiry_idx` index
+    and released by batches of `batch_size`, one short transaction per batch, so a
+    backlog of millions of abandoned lines never holds long locks.
+    `queryset` narrows the sweep (e.g. to one session). Returns the number of lines released.
+    """
+    queryset = Basket.objects.all() if queryset is None else queryset
+    batch_size = batch_size or settings.BASKET_SWEEP_BATCH_SIZE
+    now = now or timezone.now()
+    released = 0
+
+    while True:
+        with transaction.atomic():
+            # Lines already locked by a checkout or another sweeper are left for the next pass
+            ids = list(
+                queryset.expired(now)
+                .order_by("held_until")
+                .select_for_update(skip_locked=True)
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+
+            # One UPDATE per session, in a stable order to avoid deadlocks between sweepers
+            seats = (
+                Basket.objects.filter(id__in=ids).values("session_id").annotate(total=Sum("quantity")).order_by("session_id")
+            )
+            for row in seats:
+                Session.objects.filter(pk=row["session_id"]).update(available_seats=F("available_seats") + row["total"])
+
+            Basket.objects.filter(id__in=ids).delete()
+            bump_version("seats")  # .update() doesn't send post_save
+
+        released += len(ids)
+        if len(ids) < batch_size:
+            break
+
+    return released
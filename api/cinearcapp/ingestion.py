@@ -0,0 +1,122 @@
+from django.db import transaction
+from .cache import bump_version
+from .models import Genre, Movie
+
+# Fields refreshed from TMDB when a movie already exists
+MOVIE_SYNC_FIELDS = ["title", "synopsis", "duration", "type", "release_date", "picture_url", "rating", "content_hash"]
+
+# Number of rows per SELECT / INSERT statement
+BATCH_SIZE = 500
+
+
+def upsert_movies(movies):
+    """
+    Insert or refresh movies keyed on their unique `api_id`, in a single transaction.
+
+    `movies` is an iterable of unsaved Movie instances. Existing rows are read in
+    batches, only new or changed movies are written (with batched
+    INSERT ... ON CONFLICT (api_id) DO UPDATE statements) and unchanged ones are left alone.
+    The sessions of a movie whose duration changed get their end time moved.
+    Returns a dictionary with the number of inserted, updated and unchanged movies.
+    """
+    incoming = {movie.api_id: movie for movie in movies}  # The last occurrence wins
+    api_ids = list(incoming)
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+
+    with transaction.atomic():
+        # Current values of the movies we already have
+        existing = {}
+        for start in range(0, len(api_ids), BATCH_SIZE):
+            rows = Movie.objects.filter(api_id__in=api_ids[start:start + BATCH_SIZE]).values("api_id", *MOVIE_SYNC_FIELDS)
+            existing.update((row.pop("api_id"), row) for row in rows)
+
+        to_write = []
+        for api_id, movie in incoming.items():
+            current = existing.get(api_id)
+            if current is None:
+                counts["inserted"] += 1
+            elif any(getattr(movie, field) != current[field] for field in MOVIE_SYNC_FIELDS):
+                counts["updated"] += 1
+            else:
+                counts["unchanged"] += 1
+                continue
+            to_write.append(movie)
+
+        if to_write:
+            Movie.objects.bulk_create(
+                to_write,
+                batch_size=BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=["api_id"],
+                update_fields=MOVIE_SYNC_FIELDS,
+            )
+            bump_version("movie")  # bulk_create doesn't send post_save
+
+            # Nor moves the end of the sessions of a movie whose duration changed
+            for movie in to_write:
+                if movie.api_id in existing and movie.duration != existing[movie.api_id]["duration"]:
+                    movie.update_session_ends()
+
+    return counts
+
+
+def store_genres(genre_mapping):
+    """
+    Save the TMDB genre list {tmdb_id: name}, keyed on the TMDB id so that a genre
+    renamed by TMDB keeps its row and its movies.
+    Genres created from the old `Movie.type` strings (no TMDB id yet) get their id
+    attached through their name first.
+    """
+    with transaction.atomic():
+        known = set(Genre.objects.filter(api_id__in=list(genre_mapping)).values_list("api_id", flat=True))
+        ids_by_name = {name[:50]: api_id for api_id, name in genre_mapping.items() if api_id not in known}
+        legacy = list(Genre.objects.filter(api_id__isnull=True, name__in=list(ids_by_name)))
+        for genre in legacy:
+            genre.api_id = ids_by_name[genre.name]
+        Genre.objects.bulk_update(legacy, ["api_id"])
+
+        Genre.objects.bulk_create(
+            [Genre(api_id=api_id, name=name[:50]) for api_id, name in genre_mapping.items()],
+            update_conflicts=True,
+            unique_fields=["api_id"],
+            update_fields=["name", "updated_at"],
+        )
+        bump_version("movie")  # Genre names are part of the movie responses
+
+
+def set_movie_genres(genres_by_movie):
+    """
+    Replace the genres of several movies in a fixed number of queries.
+    `genres_by_movie` maps a movie `api_id` to its list of TMDB genre ids; unknown
+    genre ids are ignored. Returns the number of links added and removed.
+    """
+    movie_ids = dict(Movie.objects.filter(api_id__in=list(genres_by_movie)).values_list("api_id", "id"))
+    tmdb_ids = {genre_id for genre_ids in genres_by_movie.values() for genre_id in genre_ids}
+    genre_ids = dict(Genre.objects.filter(api_id__in=tmdb_ids).values_list("api_id", "id"))
+
+    wanted = {
+        (movie_ids[api_id], genre_ids[genre_id])
+        for api_id, tmdb_genre_ids in genres_by_movie.items() if api_id in movie_ids
+        for genre_id in tmdb_genre_ids if genre_id in genre_ids
+    }
+
+    Through = Movie.genres.through
+    with transaction.atomic():
+        current = {
+            (movie_id, genre_id): pk
+            for pk, movie_id, genre_id in Through.objects.filter(movie_id__in=movie_ids.values()).values_list(
+                "pk", "movie_id", "genre_id"
+            )
+        }
+        to_add = wanted - current.keys()
+        to_remove = [pk for link, pk in current.items() if link not in wanted]
+
+        Through.objects.bulk_create(
+            [Through(movie_id=movie_id, genre_id=genre_id) for movie_id, genre_id in to_add], batch_size=BATCH_SIZE
+        )
+        if to_remove:
+            Through.objects.filter(pk__in=to_remove).delete()
+        if to_add or to_remove:
+            bump_version("movie")  # Genres are part of the movie responses
+
+    return len(to_add), len(to_remove)
@@ -0,0 +1,85 @@
+import time
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from cinearcapp.cache import bump_version
+from cinearcapp.models import Movie, Room, Session
+from cinearcapp.scheduling import plan_schedule
+
+
+def parse_time(value):
+    """Parse a HH:MM option."""
+    try:
+        return datetime.strptime(value, "%H:%M").time()
+    except ValueError:
+        raise CommandError(f"Heure invalide : {value} (format HH:MM attendu)")
+
+
+class Command(BaseCommand):
+    help = "Planifie les séances d'une semaine dans toutes les salles, sans chevauchement."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", help="Premier jour planifié (AAAA-MM-JJ), demain par défaut")
+        parser.add_argument("--days", type=int, default=7, help="Nombre de jours planifiés")
+        parser.add_argument("--opening", default="10:00", help="Heure d'ouverture (HH:MM)")
+        parser.add_argument("--closing", default="23:30", help="Heure de fermeture (HH:MM), les séances finissent avant")
+        parser.add_argument("--buffer", type=int, default=15, help="Temps de nettoyage entre deux séances (minutes)")
+        parser.add_argument("--dry-run", action="store_true", help="Affiche le planning sans l'enregistrer")
+
+    def handle(self, *args, **options):
+        if options["start"]:
+            try:
+                first_day = datetime.strptime(options["start"], "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError("Date de début invalide (format AAAA-MM-JJ attendu)")
+        else:
+            first_day = timezone.localdate() + timedelta(days=1)
+        days = options["days"]
+        opening, closing = parse_time(options["opening"]), parse_time(options["closing"])
+        buffer = timedelta(minutes=options["buffer"])
+
+        movies = list(Movie.objects.filter(duration__gt=0).values_list("id", "duration"))
+        rooms = dict(Room.objects.values_list("id", "capacity"))
+        if not movies or not rooms:
+            raise CommandError("Aucun film ou aucune salle dans la base de données.")
+
+        # Existing sessions of the period are kept: block them, buffer included on both sides
+        window_start = timezone.make_aware(datetime.combine(first_day, datetime.min.time()))
+        window_end = window_start + timedelta(days=days + 1)
+        existing = Session.objects.filter(
+            ends_at__gt=window_start - buffer, date_hour__lt=window_end
+        ).values_list("room_id", "date_hour", "ends_at")
+        busy = {}
+        for room_id, start, end in existing:
+            busy.setdefault(room_id, []).append((start - buffer, end + buffer))
+
+        started = time.perf_counter()
+        planned = plan_schedule(movies, list(rooms), first_day, days, opening, closing, buffer, busy)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f"{len(planned)} séances planifiées pour {len(rooms)} salles sur {days} jours en {elapsed * 1000:.0f} ms.")
+        if options["dry_run"]:
+            for movie_id, room_id, start in planned:
+                self.stdout.write(f"  {timezone.localtime(start):%Y-%m-%d %H:%M}  salle {room_id}  film {movie_id}")
+            return
+
+        # bulk_create doesn't call Session.save(), set the end times and seat counters explicitly
+        durations = dict(movies)
+        with transaction.atomic():
+            Session.objects.bulk_create(
+                [
+                    Session(
+                        movie_id=movie_id,
+                        room_id=room_id,
+                        date_hour=start,
+                        ends_at=start + timedelta(minutes=durations[movie_id]),
+                        available_seats=rooms[room_id],
+                    )
+                    for movie_id, room_id, start in planned
+                ],
+                batch_size=500,
+            )
+            bump_version("session")  # No post_save signal either
+
+        self.stdout.write(self.style.SUCCESS("Planning enregistré."))
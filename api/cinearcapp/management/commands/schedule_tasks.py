@@ -1,11 +1,11 @@
 from django.core.management.base import BaseCommand
-from django_celery_beat.models import PeriodicTask, CrontabSchedule
+from django_celery_beat.models import PeriodicTask, CrontabSchedule, IntervalSchedule
 from django.utils.timezone import now
 import json
 
 
 class Command(BaseCommand):
-    help = "Ajoute une tâche planifiée pour récupérer les films en salle avec Crontab et start_time."
+    help = "Ajoute les tâches planifiées : récupération des films en salle (Crontab) et libération des paniers expirés."
 
     def handle(self, *args, **kwargs):
         start_time = now()
@@ -39,3 +39,23 @@ class Command(BaseCommand):
             self.stdout.write(self.style.SUCCESS(f"Tâche '{task_name}' ajoutée avec succès. Elle commencera à {start_time}."))
         else:
             self.stdout.write(self.style.WARNING(f"Tâche '{task_name}' mise à jour. Elle commencera à {start_time}."))
+
+        # Libération des places des paniers expirés, chaque minute
+        interval, _ = IntervalSchedule.objects.get_or_create(every=1, period=IntervalSchedule.MINUTES)
+        sweep_name = "release_expired_baskets"
+        _, created = PeriodicTask.objects.update_or_create(
+            name=sweep_name,
+            defaults={
+                "interval": interval,
+                "crontab": None,
+                "task": "cinearcapp.tasks.release_expired_baskets",
+                "args": json.dumps([]),
+                "kwargs": json.dumps({}),
+                "enabled": True,
+            }
+        )
+
+        if created:
+            self.stdout.write(self.style.SUCCESS(f"Tâche '{sweep_name}' ajoutée avec succès."))
+        else:
+            self.stdout.write(self.style.WARNING(f"Tâche '{sweep_name}' mise à jour."))
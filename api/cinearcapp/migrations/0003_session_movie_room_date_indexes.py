@@ -0,0 +1,21 @@
+# Generated by Django 5.1.7 on 2026-10-18 10:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinearcapp', '0002_alter_movie_synopsis'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['movie', 'date_hour'], name='session_movie_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['room', 'date_hour'], name='session_room_date_idx'),
+        ),
+    ]
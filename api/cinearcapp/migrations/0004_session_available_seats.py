@@ -0,0 +1,32 @@
+# Generated by Django 5.1.7 on 2026-10-18 10:57
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def init_available_seats(apps, schema_editor):
+    """Start every session at its room capacity minus the tickets already in baskets."""
+    Session = apps.get_model("cinearcapp", "Session")
+    for session in Session.objects.select_related("room").annotate(taken=Sum("baskets__quantity")):
+        session.available_seats = max(session.room.capacity - (session.taken or 0), 0)
+        session.save(update_fields=["available_seats"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinearcapp', '0003_session_movie_room_date_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='available_seats',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(init_available_seats, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='session',
+            constraint=models.CheckConstraint(condition=models.Q(('available_seats__gte', 0)), name='session_available_seats_gte_0'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+
+def split_types(apps, schema_editor):
+    """Create the genres found in the comma-joined `Movie.type` strings and link them."""
+    Movie = apps.get_model("cinearcapp", "Movie")
+    Genre = apps.get_model("cinearcapp", "Genre")
+    Through = Movie.genres.through
+
+    names_by_movie = {}
+    for movie_id, type_movie in Movie.objects.values_list("id", "type"):
+        names = {name.strip() for name in (type_movie or "").split(",")}
+        names_by_movie[movie_id] = {name for name in names if name and not name.startswith("Unknown Genre")}
+
+    all_names = set().union(*names_by_movie.values())
+    Genre.objects.bulk_create([Genre(name=name) for name in all_names], ignore_conflicts=True)
+    genre_ids = dict(Genre.objects.filter(name__in=all_names).values_list("name", "id"))
+
+    Through.objects.bulk_create(
+        [
+            Through(movie_id=movie_id, genre_id=genre_ids[name])
+            for movie_id, names in names_by_movie.items()
+            for name in names
+        ],
+        ignore_conflicts=True,
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinearcapp', '0005_genre'),
+    ]
+
+    operations = [
+        migrations.RunPython(split_types, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinearcapp', '0006_movie_genres_from_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_page', models.IntegerField(default=0)),
+                ('in_progress', models.BooleanField(default=False)),
+                ('last_run_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:10
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def merge_duplicate_lines(apps, schema_editor):
+    """Merge the unpaid lines of a user for the same session into one."""
+    Basket = apps.get_model("cinearcapp", "Basket")
+    duplicates = (
+        Basket.objects.filter(payed=False)
+        .values("user_id", "session_id")
+        .annotate(lines=Count("id"), total=Sum("quantity"))
+        .filter(lines__gt=1)
+    )
+    for duplicate in duplicates:
+        lines = Basket.objects.filter(payed=False, user_id=duplicate["user_id"], session_id=duplicate["session_id"]).order_by("id")
+        kept = lines.first()
+        lines.exclude(pk=kept.pk).delete()
+        kept.quantity = duplicate["total"]
+        kept.save(update_fields=["quantity"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinearcapp', '0007_tmdb_sync_checkpoint'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_lines, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='basket',
+            constraint=models.UniqueConstraint(condition=models.Q(('payed', False)), fields=('user', 'session'), name='basket_unique_unpaid_line'),
+        ),
+    ]
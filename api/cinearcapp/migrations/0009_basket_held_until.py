@@ -0,0 +1,36 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:12
+
+import cinearcapp.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+def clear_paid_holds(apps, schema_editor):
+    """Existing unpaid lines get a fresh hold, paid lines don't hold anything."""
+    Basket = apps.get_model("cinearcapp", "Basket")
+    Basket.objects.filter(payed=True).update(held_until=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinearcapp', '0008_basket_unique_unpaid_line'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='basket',
+            name='held_until',
+            field=models.DateTimeField(blank=True, default=cinearcapp.models.hold_expiry, null=True),
+        ),
+        migrations.RunPython(clear_paid_holds, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='basket',
+            index=models.Index(condition=models.Q(('payed', False)), fields=['held_until'], name='basket_hold_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='basket',
+            index=models.Index(condition=models.Q(('payed', False)), fields=['session', 'held_until'], name='basket_session_hold_idx'),
+        ),
+    ]
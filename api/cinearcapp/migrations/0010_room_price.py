@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinearcapp', '0009_basket_held_until'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='price',
+            field=models.PositiveIntegerField(default=1600),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinearcapp', '0010_room_price'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Order',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('paid', 'Paid'), ('canceled', 'Canceled')], default='pending', max_length=10)),
+                ('amount', models.PositiveIntegerField()),
+                ('currency', models.CharField(max_length=3)),
+                ('idempotency_key', models.CharField(max_length=100)),
+                ('checkout_id', models.CharField(blank=True, max_length=255, null=True, unique=True)),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('paid_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='orders', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OrderLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('unit_price', models.PositiveIntegerField()),
+                ('basket', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='order_lines', to='cinearcapp.basket')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='cinearcapp.order')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_lines', to='cinearcapp.session')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='order',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'pending')), fields=('idempotency_key',), name='order_unique_pending_checkout'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def check_duplicate_emails(apps, schema_editor):
+    """The unique index can't be built while two accounts share an email."""
+    User = apps.get_model("auth", "User")
+    duplicates = list(
+        User.objects.exclude(email="")
+        .annotate(email_lower=Lower("email"))
+        .values("email_lower")
+        .annotate(accounts=Count("id"))
+        .filter(accounts__gt=1)
+        .values_list("email_lower", flat=True)
+    )
+    if duplicates:
+        raise RuntimeError(f"Merge or change the accounts sharing these emails first: {', '.join(duplicates)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('cinearcapp', '0011_order'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        # Case-insensitive unique email, used by the login lookup (accounts without email are left out)
+        migrations.RunSQL(
+            "CREATE UNIQUE INDEX auth_user_email_ci_uniq ON auth_user (LOWER(email)) WHERE email <> ''",
+            "DROP INDEX auth_user_email_ci_uniq",
+        ),
+    ]
@@ -0,0 +1,76 @@
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    # External content FTS5 index: the text stays in cinearcapp_movie, accents are folded
+    """CREATE VIRTUAL TABLE cinearcapp_movie_search USING fts5(
+        title, synopsis, content='cinearcapp_movie', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    # Kept in sync by triggers, so bulk inserts and upserts (ON CONFLICT DO UPDATE) are indexed too
+    """CREATE TRIGGER cinearcapp_movie_search_insert AFTER INSERT ON cinearcapp_movie BEGIN
+        INSERT INTO cinearcapp_movie_search(rowid, title, synopsis) VALUES (new.id, new.title, new.synopsis);
+    END""",
+    """CREATE TRIGGER cinearcapp_movie_search_delete AFTER DELETE ON cinearcapp_movie BEGIN
+        INSERT INTO cinearcapp_movie_search(cinearcapp_movie_search, rowid, title, synopsis)
+        VALUES ('delete', old.id, old.title, old.synopsis);
+    END""",
+    """CREATE TRIGGER cinearcapp_movie_search_update AFTER UPDATE OF title, synopsis ON cinearcapp_movie BEGIN
+        INSERT INTO cinearcapp_movie_search(cinearcapp_movie_search, rowid, title, synopsis)
+        VALUES ('delete', old.id, old.title, old.synopsis);
+        INSERT INTO cinearcapp_movie_search(rowid, title, synopsis) VALUES (new.id, new.title, new.synopsis);
+    END""",
+    "INSERT INTO cinearcapp_movie_search(cinearcapp_movie_search) VALUES ('rebuild')",
+    # Indexed words, read to correct typos
+    "CREATE VIRTUAL TABLE cinearcapp_movie_search_terms USING fts5vocab(cinearcapp_movie_search, 'row')",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TABLE IF EXISTS cinearcapp_movie_search_terms",
+    "DROP TRIGGER IF EXISTS cinearcapp_movie_search_insert",
+    "DROP TRIGGER IF EXISTS cinearcapp_movie_search_delete",
+    "DROP TRIGGER IF EXISTS cinearcapp_movie_search_update",
+    "DROP TABLE IF EXISTS cinearcapp_movie_search",
+]
+
+POSTGRESQL_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # unaccent() isn't IMMUTABLE, this wrapper can be used in index expressions
+    """CREATE OR REPLACE FUNCTION cinearc_unaccent(text) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+        AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$""",
+    # Expression indexes are maintained by PostgreSQL itself on every write
+    """CREATE INDEX movie_search_idx ON cinearcapp_movie USING GIN ((
+        setweight(to_tsvector('french', cinearc_unaccent("title")), 'A') ||
+        setweight(to_tsvector('french', cinearc_unaccent("synopsis")), 'B')
+    ))""",
+    "CREATE INDEX movie_title_trgm_idx ON cinearcapp_movie USING GIN (cinearc_unaccent(lower(\"title\")) gin_trgm_ops)",
+]
+
+POSTGRESQL_BACKWARD = [
+    "DROP INDEX IF EXISTS movie_title_trgm_idx",
+    "DROP INDEX IF EXISTS movie_search_idx",
+    "DROP FUNCTION IF EXISTS cinearc_unaccent(text)",
+]
+
+
+def run_for_vendor(statements):
+    """Run the statements written for the database in use."""
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement, params=None)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinearcapp', '0012_user_email_unique_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor({"sqlite": SQLITE_FORWARD, "postgresql": POSTGRESQL_FORWARD}),
+            run_for_vendor({"sqlite": SQLITE_BACKWARD, "postgresql": POSTGRESQL_BACKWARD}),
+        ),
+    ]
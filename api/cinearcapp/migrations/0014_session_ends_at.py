@@ -0,0 +1,38 @@
+# Generated by Django 5.1.7 on 2026-10-18 14:20
+
+from datetime import timedelta
+from django.db import migrations, models
+from django.db.models import F
+
+
+def init_session_ends(apps, schema_editor):
+    """End every existing session after the duration of its movie."""
+    Movie = apps.get_model("cinearcapp", "Movie")
+    Session = apps.get_model("cinearcapp", "Session")
+    for movie_id, duration in Movie.objects.filter(sessions__isnull=False).distinct().values_list("id", "duration"):
+        Session.objects.filter(movie_id=movie_id).update(ends_at=F("date_hour") + timedelta(minutes=duration))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinearcapp', '0013_movie_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='ends_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(init_session_ends, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='session',
+            name='ends_at',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['room', 'ends_at'], name='session_room_end_idx'),
+        ),
+    ]
@@ -1,25 +1,61 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+import logging
+from django.db import models, transaction
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from .cache import bump_version
 from django.contrib.auth.models import User
 
+logger = logging.getLogger(__name__)
+
+# Model for Genres
+class Genre(models.Model):
+    name = models.CharField(max_length=50, unique=True)  # Name of the genre (in French)
+    api_id = models.IntegerField(unique=True, null=True, blank=True)  # TMDB genre id, if known
+    updated_at = models.DateTimeField(auto_now=True)  # Last refresh from TMDB
+
+    def __str__(self):
+        return self.name  # String representation of the genre (its name)
+
 # Model for Movies
 class Movie(models.Model):
     title = models.CharField(max_length=100)  # Title of the movie
     synopsis = models.CharField(max_length=500)  # Short description of the movie
     duration = models.IntegerField()  # Duration of the movie in minutes
-    type = models.CharField(max_length=50)  # Genre or type of the movie
+    type = models.CharField(max_length=50)  # Comma-joined genre names, kept for display
     release_date = models.DateField()  # Release date of the movie
     picture_url = models.CharField(max_length=255)  # URL of the movie poster or image
     rating = models.IntegerField()  # Rating of the movie (e.g., out of 10)
     api_id = models.IntegerField(unique=True)  # Unique identifier for the movie from an external API
+    genres = models.ManyToManyField(Genre, related_name="movies", blank=True)  # Normalized genres (indexed join)
+    content_hash = models.CharField(max_length=40, blank=True, default="")  # Hash of the last synced TMDB entry
+
+    def update_session_ends(self):
+        """
+        Move the end times of the movie's sessions along with its duration.
+        """
+        Session.objects.filter(movie__api_id=self.api_id).update(ends_at=F("date_hour") + timedelta(minutes=self.duration))
 
     def __str__(self):
         return self.title  # String representation of the movie (its title)
 
+# Model for the progress of the TMDB synchronisations
+class SyncCheckpoint(models.Model):
+    name = models.CharField(max_length=50, unique=True)  # Name of the synchronisation
+    last_page = models.IntegerField(default=0)  # Last page fully stored by the current run
+    in_progress = models.BooleanField(default=False)  # Whether a run was started and not finished
+    last_run_at = models.DateTimeField(null=True, blank=True)  # End of the last complete run
+
+    def __str__(self):
+        return self.name  # String representation of the checkpoint (its name)
+
 # Model for Rooms
 class Room(models.Model):
     capacity = models.IntegerField()  # Maximum seating capacity of the room
     name = models.CharField(max_length=50)  # Name of the room
+    price = models.PositiveIntegerField(default=1600)  # Ticket price in centimes (CHF)
 
     def __str__(self):
         return self.name  # String representation of the room (its name)
@@ -29,24 +65,219 @@ class Session(models.Model):
     movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name="sessions")  # Movie being shown in the session
     room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name="sessions")  # Room where the session is held
     date_hour = models.DateTimeField()  # Date and time of the session
+    ends_at = models.DateTimeField(editable=False)  # End of the screening (start + movie duration), for the overlap checks
+    available_seats = models.PositiveIntegerField(default=0)  # Seats not yet reserved or sold
+
+    class Meta:
+        indexes = [
+            # Composite indexes used by the session list filters (per movie / per room, by date)
+            models.Index(fields=["movie", "date_hour"], name="session_movie_date_idx"),
+            models.Index(fields=["room", "date_hour"], name="session_room_date_idx"),
+            models.Index(fields=["room", "ends_at"], name="session_room_end_idx"),  # Overlap checks
+        ]
+        constraints = [
+            # Last line of defence against overselling
+            models.CheckConstraint(condition=models.Q(available_seats__gte=0), name="session_available_seats_gte_0"),
+        ]
 
     def save(self, *args, **kwargs):
         # If the session is being created for the first time, set available seats to the room's capacity
         if not self.pk:
             self.available_seats = self.room.capacity
+        self.ends_at = self.date_hour + timedelta(minutes=self.movie.duration)
         super().save(*args, **kwargs)  # Call the parent class's save method
 
+    def overlapping_sessions(self):
+        """
+        Return the other sessions of the same room whose screening overlaps this one,
+        in a single range query over the (room, ends_at) index.
+        """
+        end = self.date_hour + timedelta(minutes=self.movie.duration)
+        return list(
+            Session.objects.filter(room_id=self.room_id, date_hour__lt=end, ends_at__gt=self.date_hour)
+            .exclude(pk=self.pk)
+            .select_related("movie")
+            .order_by("date_hour")
+        )
+
+    def reserve_seats(self, count):
+        """
+        Atomically take `count` seats from the session.
+        The conditional UPDATE only locks this session's row and never lets
+        the counter go below zero. Returns False when not enough seats remain.
+        """
+        updated = Session.objects.filter(pk=self.pk, available_seats__gte=count).update(
+            available_seats=F("available_seats") - count
+        )
+        if updated:
+            bump_version("seats")  # Cached session lists show the seat count
+        return updated == 1
+
+    def release_seats(self, count):
+        """
+        Atomically give `count` seats back to the session.
+        """
+        Session.objects.filter(pk=self.pk).update(available_seats=F("available_seats") + count)
+        bump_version("seats")
+
     def __str__(self):
         # String representation of the session (movie title, room name, and date/time)
         return f"{self.movie.title} - {self.room.name} ({self.date_hour})"
 
+# Queries on basket lines according to their seat hold
+class BasketQuerySet(models.QuerySet):
+    def held(self, now=None):
+        """Unpaid lines whose seats are still held"""
+        return self.filter(payed=False, held_until__gt=now or timezone.now())
+
+    def expired(self, now=None):
+        """Unpaid lines whose hold has run out, their seats are free again"""
+        return self.filter(payed=False, held_until__lte=now or timezone.now())
+
+def hold_expiry():
+    """End of a seat hold starting now"""
+    return timezone.now() + timedelta(minutes=settings.BASKET_HOLD_MINUTES)
+
 # Model for Basket
 class Basket(models.Model):
     session = models.ForeignKey(Session, on_delete=models.CASCADE, related_name="baskets")  # Session associated with the basket
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="baskets")  # User who owns the basket
     quantity = models.IntegerField()  # Number of tickets in the basket
     payed = models.BooleanField(default=False)  # Whether the basket has been paid for
+    held_until = models.DateTimeField(null=True, blank=True, default=hold_expiry)  # End of the seat hold of an unpaid line
+
+    objects = BasketQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Partial indexes over the unpaid lines: sweep by expiry, and expired seats of one session
+            models.Index(fields=["held_until"], condition=Q(payed=False), name="basket_hold_expiry_idx"),
+            models.Index(fields=["session", "held_until"], condition=Q(payed=False), name="basket_session_hold_idx"),
+        ]
+        constraints = [
+            # A single unpaid line per user and session, incremented in place
+            models.UniqueConstraint(
+                fields=["user", "session"], condition=Q(payed=False), name="basket_unique_unpaid_line"
+            ),
+        ]
 
     def __str__(self):
         # String representation of the basket (user email, movie title, and quantity)
         return f"{self.user.email} - {self.session.movie.title} ({self.quantity})"
+
+# Model for Orders, created at checkout
+class Order(models.Model):
+    class Status(models.TextChoices):
+        PENDING = "pending"  # Waiting for the payment provider
+        PAID = "paid"  # Payment confirmed by the webhook, the seats are sold
+        CANCELED = "canceled"  # Checkout expired without payment
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="orders")  # Buyer
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)  # Payment state
+    amount = models.PositiveIntegerField()  # Total in centimes, computed at checkout
+    currency = models.CharField(max_length=3)  # ISO currency code
+    idempotency_key = models.CharField(max_length=100)  # Identifies the basket content
+    checkout_id = models.CharField(max_length=255, unique=True, null=True, blank=True)  # Payment provider session id
+    expires_at = models.DateTimeField()  # End of the checkout, the seats are held until then
+    created_at = models.DateTimeField(auto_now_add=True)  # Checkout time
+    paid_at = models.DateTimeField(null=True, blank=True)  # Payment confirmation time
+
+    class Meta:
+        constraints = [
+            # A single pending order per basket content, so retried checkouts reuse it
+            models.UniqueConstraint(
+                fields=["idempotency_key"], condition=Q(status="pending"), name="order_unique_pending_checkout"
+            ),
+        ]
+
+    def mark_paid(self):
+        """
+        Confirm the payment: the order and its seats become sold in one transaction.
+        Basket lines still held as charged are sold with a single UPDATE. The others are
+        sold as charged too, from their snapshot: an edited line gets back the session and
+        quantity of its order line, the seats moving along, and a line swept or already
+        sold by another order of the same basket takes its seats again.
+        A checkout paid after its order was replaced (canceled) is still honored.
+        Returns False and changes nothing when the order is already paid, so a webhook
+        delivered twice is harmless.
+        """
+        with transaction.atomic():
+            confirmed = Order.objects.filter(
+                pk=self.pk, status__in=[Order.Status.PENDING, Order.Status.CANCELED]
+            ).update(status=Order.Status.PAID, paid_at=timezone.now())
+            if not confirmed:
+                return False
+
+            # Lines held as charged
+            held = list(
+                Basket.objects.select_for_update()
+                .filter(
+                    order_lines__order=self,
+                    payed=False,
+                    session_id=F("order_lines__session_id"),
+                    quantity=F("order_lines__quantity"),
+                )
+                .values_list("id", flat=True)
+            )
+            Basket.objects.filter(pk__in=held).update(payed=True, held_until=None)
+
+            # Lines edited, swept or sold since the checkout, one by one
+            lines = list(self.lines.exclude(basket_id__in=held).select_related("session"))
+            baskets = Basket.objects.select_for_update().select_related("session").in_bulk(
+                [line.basket_id for line in lines if line.basket_id is not None]
+            )
+            for line in lines:
+                basket = baskets.get(line.basket_id)
+                if basket is None or basket.payed:
+                    # Its seats were given back or belong to another order: take them again
+                    if not line.session.reserve_seats(line.quantity):
+                        logger.error("Order %s paid but session %s is sold out, refund needed", self.pk, line.session_id)
+                        continue
+                    line.basket = Basket.objects.create(
+                        user_id=self.user_id, session=line.session, quantity=line.quantity, payed=True, held_until=None
+                    )
+                    line.save(update_fields=["basket"])
+                    continue
+
+                # Bring the held seats back to what was charged
+                if basket.session_id != line.session_id:
+                    basket.session.release_seats(basket.quantity)
+                    sold = line.session.reserve_seats(line.quantity)
+                elif basket.quantity > line.quantity:
+                    line.session.release_seats(basket.quantity - line.quantity)
+                    sold = True
+                else:
+                    sold = line.session.reserve_seats(line.quantity - basket.quantity)
+                if not sold:
+                    logger.error("Order %s paid but session %s is sold out, refund needed", self.pk, line.session_id)
+                    if basket.session_id != line.session_id:
+                        basket.delete()  # Its seats were given back
+                        continue
+                    line.quantity = basket.quantity  # Sell the seats still held
+
+                basket.session, basket.quantity = line.session, line.quantity
+                basket.payed, basket.held_until = True, None
+                basket.save(update_fields=["session", "quantity", "payed", "held_until"])
+        return True
+
+    def cancel(self):
+        """
+        Close a checkout that expired unpaid. The basket lines keep their own hold.
+        """
+        return Order.objects.filter(pk=self.pk, status=Order.Status.PENDING).update(status=Order.Status.CANCELED) == 1
+
+    def __str__(self):
+        return f"Order {self.pk} - {self.user.email} ({self.status})"
+
+# Model for the lines of an order, a snapshot of the basket at checkout
+class OrderLine(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="lines")  # Order containing the line
+    basket = models.ForeignKey(
+        Basket, on_delete=models.SET_NULL, null=True, blank=True, related_name="order_lines"
+    )  # Basket line the seats are held by, unset if it was swept
+    session = models.ForeignKey(Session, on_delete=models.CASCADE, related_name="order_lines")  # Session of the tickets
+    quantity = models.PositiveIntegerField()  # Number of tickets
+    unit_price = models.PositiveIntegerField()  # Ticket price in centimes at checkout
+
+    def __str__(self):
+        return f"{self.order} - {self.session} ({self.quantity})"
@@ -0,0 +1,44 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor (keyset) pagination used by every list endpoint.
+
+    Pages are fetched with `WHERE ordering > cursor LIMIT n`, so the cost of a page
+    does not depend on its position or on the size of the table.
+    - `?page_size=` overrides the default page size (bounded by `max_page_size`)
+    - the total count is left out unless `?count=true` is given, since it costs a full COUNT(*)
+    """
+    ordering = ("id",)  # Unique, immutable key
+    page_size_query_param = "page_size"
+    max_page_size = getattr(settings, "MAX_PAGE_SIZE", 200)
+    count_query_param = "count"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # Only count when explicitly asked for
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ("1", "true"):
+            self.count = queryset.count()
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        payload = {"next": self.get_next_link(), "previous": self.get_previous_link()}
+        if self.count is not None:
+            payload["count"] = self.count
+        payload["results"] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"]["count"] = {"type": "integer", "example": 123}
+        return response_schema
+
+
+class SessionPagination(KeysetPagination):
+    """
+    Keyset pagination over the session schedule, in chronological order.
+    """
+    ordering = ("date_hour", "id")
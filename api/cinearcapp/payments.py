@@ -0,0 +1,181 @@
+import hashlib
+import hmac
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+import stripe
+
+# Checkout session created by a payment provider
+Checkout = namedtuple("Checkout", ["id", "url"])
+
+# Stripe refuses a checkout expiring less than 30 minutes after its creation, the margin
+# covers the time the request takes to reach it
+MIN_CHECKOUT_LIFETIME = timedelta(minutes=31)
+
+
+class PaymentError(Exception):
+    """The payment provider refused the request or could not be reached."""
+
+
+class PaymentProvider(ABC):
+    """
+    Interface of the payment backends.
+    Amounts are in the smallest currency unit (centimes). Providers must return the
+    same checkout for a repeated idempotency key, so a retried request never creates
+    a second payment.
+    Webhook events are signed the Stripe way (`t=<timestamp>,v1=<HMAC-SHA256>` header)
+    with `webhook_secret`.
+    """
+    webhook_secret = None
+    signature_tolerance = 300  # Seconds, older events are refused (replays)
+
+    @abstractmethod
+    def create_checkout(self, amount, currency, idempotency_key, success_url, cancel_url, expires_at, reference=None):
+        """
+        Create the hosted payment page of a checkout and return its Checkout.
+        Raises PaymentError when the provider refuses the request or can't be reached.
+        """
+
+    @abstractmethod
+    def expire_checkout(self, checkout_id):
+        """
+        Close an open checkout so that it can't be paid anymore.
+        Raises PaymentError when it can't be (already paid, provider unreachable).
+        """
+
+    def parse_event(self, payload, signature):
+        """
+        Check the signature of a webhook payload (bytes) and return the decoded event.
+        Raises PaymentError when the signature is missing, wrong or too old.
+        """
+        if not self.webhook_secret:
+            raise PaymentError("No webhook secret configured")
+        try:
+            stripe.WebhookSignature.verify_header(
+                payload.decode(), signature or "", self.webhook_secret, self.signature_tolerance
+            )
+            return json.loads(payload)
+        except (stripe.SignatureVerificationError, ValueError) as e:
+            raise PaymentError(f"Invalid webhook: {e}") from e
+
+
+class StripeProvider(PaymentProvider):
+    """
+    Stripe Checkout, called with strict timeouts so a slow Stripe can't hold the web
+    workers, and with idempotency keys so the network retries are safe.
+    Deadlines closer than MIN_CHECKOUT_LIFETIME are pushed back to it.
+    """
+
+    def __init__(self, api_key, webhook_secret, timeout, max_retries):
+        self.api_key = api_key
+        self.webhook_secret = webhook_secret
+        stripe.default_http_client = stripe.RequestsClient(timeout=timeout)  # (connect, read) seconds
+        stripe.max_network_retries = max_retries
+
+    def create_checkout(self, amount, currency, idempotency_key, success_url, cancel_url, expires_at, reference=None):
+        try:
+            session = stripe.checkout.Session.create(
+                api_key=self.api_key,
+                idempotency_key=idempotency_key,
+                payment_method_types=["card"],
+                line_items=[
+                    {
+                        "price_data": {
+                            "currency": currency,
+                            "product_data": {"name": "Cinema Reservation"},
+                            "unit_amount": amount,
+                        },
+                        "quantity": 1,
+                    }
+                ],
+                mode="payment",
+                expires_at=int(max(expires_at, timezone.now() + MIN_CHECKOUT_LIFETIME).timestamp()),
+                client_reference_id=reference,
+                success_url=success_url,
+                cancel_url=cancel_url,
+            )
+        except stripe.StripeError as e:
+            raise PaymentError(str(e)) from e
+        return Checkout(session.id, session.url)
+
+    def expire_checkout(self, checkout_id):
+        try:
+            stripe.checkout.Session.expire(checkout_id, api_key=self.api_key)
+        except stripe.StripeError as e:
+            raise PaymentError(str(e)) from e
+
+
+class FakeProvider(PaymentProvider):
+    """
+    In-process provider for the tests and local development, without any network call.
+    Mimics Stripe's idempotency (a key reused with other parameters is an error) and
+    signs fake webhook events with `sign`.
+    """
+    webhook_secret = "whsec_fake"
+
+    def __init__(self):
+        self.checkouts = {}  # Idempotency key -> (parameters, checkout)
+        self.expired = set()  # Ids of the checkouts closed by expire_checkout
+
+    def create_checkout(self, amount, currency, idempotency_key, success_url, cancel_url, expires_at, reference=None):
+        params = (amount, currency, success_url, cancel_url, expires_at, reference)
+        if idempotency_key in self.checkouts:
+            previous, checkout = self.checkouts[idempotency_key]
+            if previous != params:
+                raise PaymentError("Idempotency key reused with different parameters")
+            return checkout
+
+        checkout_id = f"cs_fake_{len(self.checkouts) + 1}"
+        checkout = Checkout(checkout_id, f"{success_url}?session_id={checkout_id}")
+        self.checkouts[idempotency_key] = (params, checkout)
+        return checkout
+
+    def expire_checkout(self, checkout_id):
+        self.expired.add(checkout_id)
+
+    def sign(self, payload, timestamp=None):
+        """
+        Return the Stripe-Signature header of a payload (bytes), as Stripe would send it.
+        """
+        timestamp = int(time.time()) if timestamp is None else timestamp
+        signed = f"{timestamp}.".encode() + payload
+        signature = hmac.new(self.webhook_secret.encode(), signed, hashlib.sha256).hexdigest()
+        return f"t={timestamp},v1={signature}"
+
+
+# One provider instance per backend name, reused across requests
+_providers = {}
+
+
+def get_payment_provider():
+    """
+    Return the provider selected by the PAYMENT_PROVIDER setting ("stripe" or "fake").
+    """
+    name = settings.PAYMENT_PROVIDER
+    if name not in _providers:
+        if name == "stripe":
+            _providers[name] = StripeProvider(
+                settings.STRIPE_SECRET_KEY,
+                settings.STRIPE_WEBHOOK_SECRET,
+                settings.STRIPE_TIMEOUT,
+                settings.STRIPE_MAX_NETWORK_RETRIES,
+            )
+        elif name == "fake":
+            _providers[name] = FakeProvider()
+        else:
+            raise ValueError(f"Unknown payment provider: {name}")
+    return _providers[name]
+
+
+def checkout_idempotency_key(user, lines):
+    """
+    Idempotency key of a checkout: the same basket (lines and quantities) always gives
+    the same key, any change to it gives a new one.
+    `lines` is an iterable of (line id, quantity) pairs.
+    """
+    content = ",".join(f"{line_id}x{quantity}" for line_id, quantity in sorted(lines))
+    return f"checkout-{user.pk}-{hashlib.sha256(content.encode()).hexdigest()[:32]}"
@@ -0,0 +1,33 @@
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Drop-in JSONRenderer encoding with orjson.
+
+    Types orjson doesn't know (lazy translations, Decimal...) go through DRF's own
+    encoder, and `; indent=` in the Accept header still pretty-prints (always by 2).
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        option = orjson.OPT_NON_STR_KEYS
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=self.encoder_class().default, option=option)
+
+
+class ORJSONParser(JSONParser):
+    """
+    Drop-in JSONParser decoding with orjson (UTF-8 bodies, as JSON requires).
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
@@ -0,0 +1,92 @@
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from .cache import get_stamps
+
+logger = logging.getLogger(__name__)
+
+# Set while a view may read from a replica (a context variable, so it also works with async views)
+_replica_reads = ContextVar("replica_reads", default=False)
+
+
+@contextmanager
+def replica_reads():
+    """
+    Let the reads of the block go to a replica.
+    """
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def replica_allowed(tables):
+    """
+    Whether reads of `tables` may go to a replica: none of them changed in the last
+    REPLICA_LAG_TOLERANCE seconds (change times from the catalog cache stamps).
+    """
+    if not settings.DATABASE_REPLICAS:
+        return False
+    try:
+        _, last_modified = get_stamps(*tables)
+    except Exception:
+        logger.exception("Catalog cache unavailable")
+        return False
+    return time.time() - last_modified >= settings.REPLICA_LAG_TOLERANCE
+
+
+class PrimaryReplicaRouter:
+    """
+    Route reads to a random replica of DATABASE_REPLICAS inside replica_reads() blocks,
+    everything else to the primary ("default").
+
+    Reads made inside a transaction stay on the primary, so they see its writes.
+    Replicas are never migrated, they follow the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            _replica_reads.get()
+            and settings.DATABASE_REPLICAS
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return random.choice(settings.DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # All the aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaReadsMixin:
+    """
+    Serve the list and retrieve actions of a catalog viewset from the replicas.
+
+    The reads stay on the primary for a while after one of `cache_tables` changed
+    (read-your-writes across the replication lag, see replica_allowed).
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.read_from_replica(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.read_from_replica(super().retrieve, request, *args, **kwargs)
+
+    def read_from_replica(self, view, request, *args, **kwargs):
+        if not replica_allowed(self.cache_tables):
+            return view(request, *args, **kwargs)
+        with replica_reads():
+            return view(request, *args, **kwargs)
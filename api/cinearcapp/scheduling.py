@@ -0,0 +1,95 @@
+import heapq
+from datetime import datetime, timedelta
+from django.utils import timezone
+
+# Start times are rounded up to this step (minutes)
+START_STEP = 5
+
+
+def round_up(moment, step=START_STEP):
+    """
+    Round a datetime up to the next multiple of `step` minutes.
+    """
+    extra = (moment.minute % step) * 60 + moment.second + moment.microsecond / 1e6
+    if not extra:
+        return moment
+    return moment + timedelta(seconds=step * 60 - extra)
+
+
+def free_gaps(day_open, day_close, busy):
+    """
+    Return the free (start, end) intervals of [day_open, day_close] around the
+    `busy` intervals, which must be sorted by start.
+    """
+    gaps = []
+    cursor = day_open
+    for start, end in busy:
+        if end <= cursor:
+            continue
+        if start >= day_close:
+            break
+        if start > cursor:
+            gaps.append((cursor, start))
+        cursor = max(cursor, end)
+    if cursor < day_close:
+        gaps.append((cursor, day_close))
+    return gaps
+
+
+def plan_schedule(movies, rooms, first_day, days, opening, closing, buffer, busy=None):
+    """
+    Plan the sessions of `days` days starting at `first_day` in every room.
+
+    - `movies`: list of (movie_id, duration in minutes)
+    - `rooms`: list of room ids
+    - `opening` / `closing`: daily opening hours (datetime.time), a session must end by closing
+    - `buffer`: cleaning time (timedelta) kept free after every session
+    - `busy`: {room_id: [(start, end), ...]} intervals already taken by existing sessions,
+      widened by the buffer on both sides
+
+    The free gaps of each room and day are filled greedily, always with the movie that
+    has the fewest screenings so far among those that still fit, so the programme is
+    spread evenly over the catalog. Sessions never overlap, buffer included.
+    Returns a list of (movie_id, room_id, start) tuples.
+    """
+    busy = busy or {}
+    movies = [(movie_id, timedelta(minutes=duration)) for movie_id, duration in movies if duration > 0]
+    if not movies or not rooms:
+        return []
+    shortest = min(duration for _, duration in movies)
+
+    # Movies ordered by (number of screenings, position in the catalog)
+    queue = [(0, index, movie_id, duration) for index, (movie_id, duration) in enumerate(movies)]
+    heapq.heapify(queue)
+
+    planned = []
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        day_open = timezone.make_aware(datetime.combine(day, opening))
+        day_close = timezone.make_aware(datetime.combine(day, closing))
+        if day_close <= day_open:
+            day_close += timedelta(days=1)  # Closing after midnight
+
+        for room_id in rooms:
+            room_busy = sorted(busy.get(room_id, []))
+            for gap_start, gap_end in free_gaps(day_open, day_close, room_busy):
+                cursor = round_up(gap_start)
+                while cursor + shortest <= gap_end:
+                    # Least screened movie that still fits in the rest of the gap
+                    skipped = []
+                    while queue and cursor + queue[0][3] > gap_end:
+                        skipped.append(heapq.heappop(queue))
+                    if not queue:
+                        queue = skipped
+                        heapq.heapify(queue)
+                        break
+
+                    count, index, movie_id, duration = heapq.heappop(queue)
+                    planned.append((movie_id, room_id, cursor))
+                    heapq.heappush(queue, (count + 1, index, movie_id, duration))
+                    for item in skipped:
+                        heapq.heappush(queue, item)
+
+                    cursor = round_up(cursor + duration + buffer)
+
+    return planned
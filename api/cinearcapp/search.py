@@ -0,0 +1,133 @@
+import re
+import unicodedata
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+# SQLite: FTS5 index of the movie titles and synopses, and its vocabulary (migration 0013)
+FTS_TABLE = "cinearcapp_movie_search"
+FTS_TERMS_TABLE = "cinearcapp_movie_search_terms"
+TITLE_WEIGHT = 10.0  # bm25 weight of the title against the synopsis
+FTS_CANDIDATES = 1000  # Best FTS matches read before the other filters of the list apply
+
+# PostgreSQL: same expressions as the GIN indexes of migration 0013, so the planner uses them
+SEARCH_VECTOR_SQL = (
+    "(setweight(to_tsvector('french', cinearc_unaccent(\"cinearcapp_movie\".\"title\")), 'A') || "
+    "setweight(to_tsvector('french', cinearc_unaccent(\"cinearcapp_movie\".\"synopsis\")), 'B'))"
+)
+SEARCH_QUERY_SQL = "websearch_to_tsquery('french', cinearc_unaccent(%s))"
+TITLE_TRIGRAMS_SQL = "cinearc_unaccent(lower(\"cinearcapp_movie\".\"title\"))"
+
+
+def normalize(text):
+    """
+    Lowercase and strip the accents, like the `unicode61 remove_diacritics` tokenizer.
+    """
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def edit_distance(a, b, limit):
+    """
+    Optimal string alignment distance between `a` and `b` (a swap of two letters counts
+    as one typo), or `limit + 1` as soon as it is known to exceed `limit`.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit and min(previous) >= limit:  # Later rows can only grow
+            return limit + 1
+    return current[-1]
+
+
+def similar_terms(cursor, word):
+    """
+    Indexed words within one typo of `word` (two for words longer than 5 letters).
+    Only the words sharing its first two letters are compared, read from the FTS
+    vocabulary through a range scan.
+    """
+    limit = 1 if len(word) <= 5 else 2
+    if len(word) < 3:
+        return []
+    prefix = word[:2]
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    cursor.execute(
+        f"SELECT term FROM {FTS_TERMS_TABLE} WHERE term >= %s AND term < %s",
+        [prefix, upper],
+    )
+    return [term for (term,) in cursor.fetchall() if term != word and edit_distance(word, term, limit) <= limit]
+
+
+def fts_ranking(cursor, expression):
+    """Movie ids matching an FTS5 expression, best first."""
+    cursor.execute(
+        f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+        f"ORDER BY bm25({FTS_TABLE}, %s, 1.0) LIMIT %s",
+        [expression, TITLE_WEIGHT, FTS_CANDIDATES],
+    )
+    return [movie_id for (movie_id,) in cursor.fetchall()]
+
+
+def sqlite_search(queryset, text, limit):
+    words = re.findall(r"\w+", normalize(text))
+    if not words:
+        return []
+
+    with connections[queryset.db].cursor() as cursor:
+        # Every word must match, the last one as a prefix (search as you type)
+        exact = " ".join(f'"{word}"' for word in words) + "*"
+        ranking = fts_ranking(cursor, exact)
+        if not ranking:
+            # Nothing found, try again with the indexed words close to each typed word
+            groups = []
+            for index, word in enumerate(words):
+                variants = [f'"{term}"' for term in [word] + similar_terms(cursor, word)]
+                if index == len(words) - 1:
+                    variants[0] += "*"
+                groups.append("(" + " OR ".join(variants) + ")")
+            ranking = fts_ranking(cursor, " AND ".join(groups))
+
+    # Keep the best matches allowed by the other filters, then load only those
+    allowed = set(queryset.filter(id__in=ranking).values_list("id", flat=True))
+    best = [movie_id for movie_id in ranking if movie_id in allowed][:limit]
+    movies = {movie.id: movie for movie in queryset.filter(id__in=best)}
+    return [movies[movie_id] for movie_id in best]
+
+
+def postgresql_search(queryset, text, limit):
+    # Bare boolean conditions, so that each side of the OR can use its GIN index
+    matched = RawSQL(f"{SEARCH_VECTOR_SQL} @@ {SEARCH_QUERY_SQL}", [text], output_field=BooleanField())
+    # pg_trgm similarity above its threshold, tolerates typos in the title
+    similar = RawSQL(f"{TITLE_TRIGRAMS_SQL} %% cinearc_unaccent(lower(%s))", [text], output_field=BooleanField())
+    return list(
+        queryset.filter(Q(matched) | Q(similar))
+        .annotate(
+            relevance=RawSQL(
+                f"ts_rank({SEARCH_VECTOR_SQL}, {SEARCH_QUERY_SQL}) + "
+                f"similarity({TITLE_TRIGRAMS_SQL}, cinearc_unaccent(lower(%s)))",
+                [text, text],
+                output_field=FloatField(),
+            )
+        )
+        .order_by("-relevance", "id")[:limit]
+    )
+
+
+def search_movies(queryset, text, limit):
+    """
+    Return the `limit` movies of `queryset` most relevant to `text`, best first.
+
+    Titles weigh more than synopses, accents and case are ignored and a typo per word
+    is tolerated. Runs on the full-text index of the database: FTS5 on SQLite,
+    tsvector and trigram GIN indexes on PostgreSQL.
+    """
+    if connections[queryset.db].vendor == "postgresql":
+        return postgresql_search(queryset, text, limit)
+    return sqlite_search(queryset, text, limit)
@@ -1,10 +1,106 @@
+from operator import attrgetter
 from rest_framework import serializers
+from rest_framework import ISO_8601
+from rest_framework.fields import SkipField
+from rest_framework.settings import api_settings
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
 from .models import Movie, Session, Basket, Room
 
 # Get the default user model
 User = get_user_model()
 
+# Fields whose representation is the model attribute itself
+PLAIN_FIELDS = (serializers.CharField, serializers.IntegerField, serializers.BooleanField)
+
+def datetime_reader(field, source):
+    """
+    ISO 8601 rendering of an aware datetime, with the timezone resolved once instead of per value.
+    """
+    tz = field.timezone if hasattr(field, "timezone") else field.default_timezone()
+
+    def read_datetime(instance):
+        value = getattr(instance, source)
+        if value is None or value.tzinfo is None or tz is None:
+            return field.to_representation(value)
+        text = value.astimezone(tz).isoformat()
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+    return read_datetime
+
+def field_reader(field):
+    """
+    Function rendering `field` from an instance, like field.to_representation(field.get_attribute(...))
+    but without the per-field dispatch for the common cases.
+    """
+    source = field.source
+    if isinstance(field, serializers.ModelSerializer):
+        readers = instance_readers(field)
+
+        def read_nested(instance):
+            value = getattr(instance, source)
+            return None if value is None else {name: read(value) for name, read in readers}
+        return read_nested
+    if isinstance(field, serializers.SerializerMethodField):
+        return getattr(field.parent, field.method_name)
+    if "." not in source:
+        if type(field) in PLAIN_FIELDS or (
+            type(field) is serializers.BigIntegerField
+            and not getattr(field, "coerce_to_string", api_settings.COERCE_BIGINT_TO_STRING)
+        ):
+            return attrgetter(source)
+        if type(field) is serializers.DateTimeField and getattr(field, "format", api_settings.DATETIME_FORMAT) == ISO_8601:
+            return datetime_reader(field, source)
+        if isinstance(field, serializers.ManyRelatedField) and isinstance(field.child_relation, serializers.SlugRelatedField):
+            slug = field.child_relation.slug_field
+
+            def read_slugs(instance):
+                # The prefetched rows, without building a related manager per instance
+                items = getattr(instance, "_prefetched_objects_cache", {}).get(source)
+                if items is None:
+                    items = getattr(instance, source).all()
+                return [getattr(item, slug) for item in items]
+            return read_slugs
+
+    def read(instance):
+        attribute = field.get_attribute(instance)  # May raise SkipField
+        return None if attribute is None else field.to_representation(attribute)
+    return read
+
+def instance_readers(serializer):
+    return [(name, field_reader(field)) for name, field in serializer.fields.items() if not field.write_only]
+
+# Read-only list path: the readers of the child fields are resolved once per list
+class FastListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        readers = instance_readers(self.child)
+        items = data.all() if hasattr(data, "all") else data
+        rows = []
+        for item in items:
+            try:
+                rows.append({name: read(item) for name, read in readers})
+            except SkipField:
+                rows.append(self.child.to_representation(item))  # Rare: let DRF drop the field
+        return rows
+
+# Serializer whose representation can be narrowed (see fieldsets.SparseFieldsMixin)
+class SparseFieldsSerializer(serializers.ModelSerializer):
+    compact_fields = None  # Fields kept when nested in a list without being expanded
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        """
+        `fields`: names of the fields to keep, None for all.
+        `expand`: nested serializers rendered in full, the others use their compact fields
+        (None expands all of them).
+        """
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        if expand is not None:
+            for name, field in list(self.fields.items()):
+                if isinstance(field, SparseFieldsSerializer) and field.compact_fields and name not in expand:
+                    self.fields[name] = type(field)(read_only=True, fields=field.compact_fields)
+
 # Serializer for the User model
 class UserSerializer(serializers.ModelSerializer):
     # Password field is write-only and styled as a password input
@@ -15,24 +111,37 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ["id", "first_name", "last_name", "email", "password", "is_superuser"]
 
     def create(self, validated_data):
-        # Create a user with a hashed password
-        user = User.objects.create_user(**validated_data)
-        return user
+        # Create a user with a hashed password, the unique indexes reject duplicates
+        try:
+            with transaction.atomic():
+                return User.objects.create_user(**validated_data)
+        except IntegrityError:
+            raise serializers.ValidationError({"email": "A user with this email or username already exists."})
 
 # Serializer for the Movie model
-class MovieSerializer(serializers.ModelSerializer):
+class MovieSerializer(SparseFieldsSerializer):
+    # Genre names, the relation must be prefetched by the views
+    genres = serializers.SlugRelatedField(many=True, read_only=True, slug_field="name")
+
+    # What a movie grid needs: no synopsis, no prefetched genres (`type` holds their names)
+    compact_fields = ["id", "title", "picture_url", "rating", "type"]
+
     class Meta:
         model = Movie
-        fields = "__all__"  # Include all fields from the Movie model
+        list_serializer_class = FastListSerializer  # Read-only fast path for the lists
+        exclude = ["content_hash"]  # Include all fields from the Movie model but the sync bookkeeping
 
 # Serializer for the Room model
-class RoomSerializer(serializers.ModelSerializer):
+class RoomSerializer(SparseFieldsSerializer):
+    compact_fields = ["id", "name"]
+
     class Meta:
         model = Room
+        list_serializer_class = FastListSerializer  # Read-only fast path for the lists
         fields = "__all__"  # Include all fields from the Room model
 
 # Serializer for the Session model
-class SessionSerializer(serializers.ModelSerializer):
+class SessionSerializer(SparseFieldsSerializer):
     # Nested serializers for movie and room (read-only)
     movie = MovieSerializer(read_only=True)
     room = RoomSerializer(read_only=True)
@@ -43,9 +152,35 @@ class SessionSerializer(serializers.ModelSerializer):
     room_id = serializers.PrimaryKeyRelatedField(
         queryset=Room.objects.all(), source='room', write_only=True)
 
+    # Maintained by seat reservations only, plus the expired holds not swept yet when the view annotates them
+    available_seats = serializers.SerializerMethodField()
+
     class Meta:
         model = Session
-        fields = ["id", "movie", "room", "movie_id", "room_id", "date_hour"]
+        list_serializer_class = FastListSerializer  # Read-only fast path for the lists
+        fields = ["id", "movie", "room", "movie_id", "room_id", "date_hour", "available_seats"]
+
+    def get_available_seats(self, obj) -> int:
+        return obj.available_seats + getattr(obj, "expired_seats", 0)
+
+# Serializer for one operation of a bulk session request
+class SessionOperationSerializer(serializers.Serializer):
+    # Plain ids: the view resolves all the movies, rooms and sessions of a request in one query each
+    op = serializers.ChoiceField(choices=["create", "update", "delete"])
+    id = serializers.IntegerField(required=False)
+    movie_id = serializers.IntegerField(required=False)
+    room_id = serializers.IntegerField(required=False)
+    date_hour = serializers.DateTimeField(required=False)
+
+    def validate(self, data):
+        """Check the fields required by each kind of operation"""
+        if data["op"] == "create":
+            missing = [field for field in ("movie_id", "room_id", "date_hour") if field not in data]
+            if missing:
+                raise serializers.ValidationError({field: "Ce champ est obligatoire." for field in missing})
+        elif "id" not in data:
+            raise serializers.ValidationError({"id": "Ce champ est obligatoire."})
+        return data
 
 # Serializer for the Basket model
 class BasketSerializer(serializers.ModelSerializer):
@@ -57,14 +192,25 @@ class BasketSerializer(serializers.ModelSerializer):
     session_id = serializers.PrimaryKeyRelatedField(
         queryset=Session.objects.all(), source='session', write_only=True)
     user_id = serializers.PrimaryKeyRelatedField(
-        queryset=User.objects.all(), source='user', write_only=True)
+        queryset=User.objects.all(), source='user', write_only=True, required=False)  # The view uses the logged-in user
 
     class Meta:
         model = Basket
-        fields = ["id", "session", "user", "quantity", "payed", "session_id", "user_id"]
+        fields = ["id", "session", "user", "quantity", "payed", "held_until", "session_id", "user_id"]
+        read_only_fields = ["payed", "held_until"]  # Set by the payment and the seat hold
 
     def validate_quantity(self, value):
         """Ensure the quantity is positive and greater than zero"""
         if value <= 0:
             raise serializers.ValidationError("La quantité doit être au moins 1.")  # Error message in French
-        return value
\ No newline at end of file
+        return value
+
+# Serializer for the "add to basket" action: plain ids in, the changed line only out
+class BasketLineSerializer(serializers.ModelSerializer):
+    session_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, error_messages={"min_value": "La quantité doit être au moins 1."})
+
+    class Meta:
+        model = Basket
+        fields = ["id", "session_id", "quantity", "held_until"]
+        read_only_fields = ["id", "held_until"]
\ No newline at end of file
@@ -0,0 +1,42 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from .authentication import user_stamp, user_stamp_timeout
+from .cache import bump_version
+from .models import Genre, Movie, Room, Session
+
+
+@receiver([post_save, post_delete], sender=Movie)
+@receiver([post_save, post_delete], sender=Room)
+@receiver([post_save, post_delete], sender=Session)
+def invalidate_catalog_cache(sender, **kwargs):
+    """
+    Invalidate the cached catalog responses built from the changed table.
+    """
+    bump_version(sender._meta.model_name)
+
+
+@receiver(post_save, sender=Movie)
+def update_session_ends(sender, instance, created, **kwargs):
+    """
+    Sessions end with their movie, follow a duration change.
+    """
+    if not created:
+        instance.update_session_ends()
+
+
+@receiver([post_save, post_delete], sender=Genre)
+@receiver(m2m_changed, sender=Movie.genres.through)
+def invalidate_movie_genres(sender, **kwargs):
+    """
+    Genre names are embedded in the movie responses.
+    """
+    bump_version("movie")
+
+
+@receiver([post_save, post_delete], sender=get_user_model())
+def invalidate_cached_user(sender, instance, **kwargs):
+    """
+    Drop the copy of the user cached by the JWT authentication.
+    """
+    bump_version(user_stamp(instance.pk), timeout=user_stamp_timeout())
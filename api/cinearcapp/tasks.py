@@ -1,9 +1,20 @@
+import hashlib
+import json
 import os
 import requests
-from datetime import datetime
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from celery import shared_task
 from dotenv import load_dotenv
-from cinearcapp.models import Movie
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from cinearcapp.models import Genre, Movie, SyncCheckpoint
+from cinearcapp.ingestion import set_movie_genres, store_genres, upsert_movies
+from cinearcapp.holds import release_expired_holds
 
 # Load environment variables from the .env file
 load_dotenv()
@@ -15,25 +26,79 @@ TMDB_API_KEY = os.getenv("TMDB_API_KEY")
 if not TMDB_API_KEY:
     raise ValueError("ERROR: TMDB API key is missing! Check your .env file")
 
-# Define TMDB API endpoints
-TMDB_NOW_PLAYING_URL = "https://api.themoviedb.org/3/movie/now_playing"
-TMDB_MOVIE_DETAILS_URL = "https://api.themoviedb.org/3/movie/{movie_id}"
-TMDB_GENRES_URL = "https://api.themoviedb.org/3/genre/movie/list"
+# Define TMDB API endpoints (the base URL can point to a local fake server)
+TMDB_API_URL = os.getenv("TMDB_API_URL", "https://api.themoviedb.org/3").rstrip("/")
+TMDB_NOW_PLAYING_URL = f"{TMDB_API_URL}/movie/now_playing"
+TMDB_MOVIE_DETAILS_URL = f"{TMDB_API_URL}/movie/{{movie_id}}"
+TMDB_GENRES_URL = f"{TMDB_API_URL}/genre/movie/list"
+
+# HTTP client settings
+TMDB_MAX_WORKERS = int(os.getenv("TMDB_MAX_WORKERS", "8"))  # Concurrent detail requests
+TMDB_TIMEOUT = (3.05, 10)  # Connect and read timeouts in seconds
+TMDB_RETRIES = Retry(
+    total=4,
+    backoff_factor=0.5,  # 0.5s, 1s, 2s, 4s between attempts
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=("GET",),
+    respect_retry_after_header=True,  # TMDB rate limiting
+)
+DEFAULT_RUNTIME = 90  # Used only when TMDB has no runtime for a movie
+TMDB_GENRES_TTL = timedelta(hours=int(os.getenv("TMDB_GENRES_TTL_HOURS", "168")))  # Genre list refresh period
+TMDB_MAX_PAGES = int(os.getenv("TMDB_MAX_PAGES", "500"))  # TMDB never serves more than 500 pages
+
+# Synchronisation checkpoint and the now_playing fields that are stored
+NOW_PLAYING_SYNC = "tmdb_now_playing"
+TMDB_HASHED_FIELDS = ("title", "overview", "genre_ids", "release_date", "poster_path", "vote_average")
+
+def create_tmdb_session(pool_size=TMDB_MAX_WORKERS):
+    """
+    Create an HTTP session that keeps its connections to TMDB alive and retries
+    failed requests with exponential backoff.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=TMDB_RETRIES)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+# Shared by every request of the worker process
+tmdb_session = create_tmdb_session()
+
+def tmdb_get(url, **params):
+    """
+    GET a TMDB endpoint through the pooled session and return the decoded JSON.
+    Raises requests.exceptions.RequestException once the retries are exhausted.
+    """
+    response = tmdb_session.get(
+        url, params={"api_key": TMDB_API_KEY, "language": "fr-FR", **params}, timeout=TMDB_TIMEOUT
+    )
+    response.raise_for_status()
+    return response.json()
 
 def fetch_movie_runtime(movie_id):
     """
     Fetch the runtime of a movie in minutes using the TMDB API.
-    If the runtime is not found, a default value of 90 minutes is used.
+    Movies without a runtime on TMDB get a default value of 90 minutes.
     """
-    try:
-        url = TMDB_MOVIE_DETAILS_URL.format(movie_id=movie_id)
-        response = requests.get(url, params={"api_key": TMDB_API_KEY, "language": "fr-FR"})
-        response.raise_for_status()
-        data = response.json()
-        return data.get("runtime", 90)  # Default to 90 minutes if runtime is not found
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching runtime for movie {movie_id}: {e}")
-        return 90  # Default value in case of an error
+    data = tmdb_get(TMDB_MOVIE_DETAILS_URL.format(movie_id=movie_id))
+    return data.get("runtime") or DEFAULT_RUNTIME
+
+def fetch_movie_runtimes(movie_ids, max_workers=TMDB_MAX_WORKERS):
+    """
+    Fetch the runtimes of several movies concurrently.
+    Returns a dictionary {movie_id: runtime}; movies whose details could not be
+    fetched after the retries are left out.
+    """
+    def fetch(movie_id):
+        try:
+            return movie_id, fetch_movie_runtime(movie_id)
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching runtime for movie {movie_id}: {e}")
+            return movie_id, None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(fetch, movie_ids)
+        return {movie_id: runtime for movie_id, runtime in results if runtime is not None}
 
 def fetch_genres():
     """
@@ -41,9 +106,7 @@ def fetch_genres():
     Returns a dictionary mapping genre IDs to genre names.
     """
     try:
-        response = requests.get(TMDB_GENRES_URL, params={"api_key": TMDB_API_KEY, "language": "fr-FR"})
-        response.raise_for_status()
-        genres_data = response.json()
+        genres_data = tmdb_get(TMDB_GENRES_URL)
         
         # Transform the list of genres into a dictionary {id: name}
         genre_dict = {genre["id"]: genre["name"] for genre in genres_data.get("genres", [])}
@@ -53,79 +116,145 @@ def fetch_genres():
         print(f"Error fetching genres: {e}")
         return {}
 
+def get_genre_mapping():
+    """
+    Return the TMDB genre mapping {id: name}.
+    The list stored in the database is used while it is fresher than TMDB_GENRES_TTL,
+    otherwise it is fetched again from TMDB and stored.
+    """
+    genres = Genre.objects.filter(api_id__isnull=False)
+    last_refresh = genres.aggregate(last=Max("updated_at"))["last"]
+    if last_refresh and last_refresh >= timezone.now() - TMDB_GENRES_TTL:
+        return dict(genres.values_list("api_id", "name"))
+
+    genre_mapping = fetch_genres()
+    if genre_mapping:
+        store_genres(genre_mapping)
+        return genre_mapping
+    return dict(genres.values_list("api_id", "name"))  # TMDB unavailable, keep the stale list
+
+def movie_content_hash(entry):
+    """
+    Hash the fields of a now_playing entry that end up in the database.
+    """
+    content = {key: entry.get(key) for key in TMDB_HASHED_FIELDS}
+    return hashlib.sha1(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+def build_movie(entry, duration, genre_mapping):
+    """
+    Build an unsaved Movie from a now_playing entry.
+    Returns None when the entry can't be stored (no release date).
+    """
+    title = entry.get("title", "Unknown Title")
+    release_date = entry.get("release_date", None)
+
+    # Parse the release date if it exists
+    if release_date:
+        try:
+            release_date = datetime.strptime(release_date, "%Y-%m-%d").date()
+        except ValueError:
+            release_date = None
+
+    # A movie without release date can't be stored
+    if release_date is None:
+        print(f"Movie skipped, no release date: {title}")
+        return None
+
+    # Convert genre IDs to genre names
+    type_movie = ", ".join(genre_mapping.get(g, f"Unknown Genre ({g})") for g in entry.get("genre_ids", []))
+
+    return Movie(
+        title=title[:100],
+        synopsis=entry.get("overview", "")[:500],
+        duration=duration,
+        type=type_movie[:50],
+        release_date=release_date,
+        picture_url=f"https://image.tmdb.org/t/p/w500{entry.get('poster_path')}" if entry.get("poster_path") else "",
+        rating=int(entry.get("vote_average", 0)),
+        api_id=entry["id"],
+        content_hash=movie_content_hash(entry),
+    )
+
+def prepare_movies(entries, genre_mapping):
+    """
+    Build the movies of one now_playing page that are new or changed since the last sync.
+    Unchanged entries (same content hash) cost neither a detail request nor a write.
+    Returns the movies to store, their TMDB genre ids and the unchanged/skipped counts.
+    """
+    hashes = {entry["id"]: movie_content_hash(entry) for entry in entries if entry.get("id")}
+    known = dict(Movie.objects.filter(api_id__in=list(hashes)).values_list("api_id", "content_hash"))
+    changed = [entry for entry in entries if entry.get("id") in hashes and known.get(entry["id"]) != hashes[entry["id"]]]
+    counts = {"unchanged": len(hashes) - len(changed), "skipped": 0}
+
+    # Fetch the runtimes of the changed movies concurrently
+    runtimes = fetch_movie_runtimes([entry["id"] for entry in changed]) if changed else {}
+
+    to_store = []
+    genres_by_movie = {}
+    for entry in changed:
+        # Skip the movie rather than store a made-up runtime when its details failed
+        duration = runtimes.get(entry["id"])
+        movie = build_movie(entry, duration, genre_mapping) if duration is not None else None
+        if movie is None:
+            counts["skipped"] += 1
+            continue
+        to_store.append(movie)
+        genres_by_movie[movie.api_id] = entry.get("genre_ids", [])
+
+    return to_store, genres_by_movie, counts
+
 @shared_task
 def fetch_and_store_movies():
     """
-    Fetch the currently playing movies from TMDB and store them in the database.
-    If a movie already exists in the database, it will not be added again.
+    Synchronise the movies currently playing in Switzerland with TMDB, page by page.
+
+    Each page is stored in its own transaction together with a checkpoint, so a run
+    that crashes resumes after the last stored page. Movies whose TMDB entry did not
+    change since the last run are neither fetched again nor written.
     """
     try:
         # Fetch the mapping of genre IDs to genre names
-        genre_mapping = fetch_genres()
+        genre_mapping = get_genre_mapping()
 
         if not genre_mapping:
             print("Warning: No genres retrieved, movies will be saved with IDs instead of names.")
 
-        # Define parameters for the TMDB API request
-        params = {
-            "api_key": TMDB_API_KEY,
-            "language": "fr-FR",
-            "page": 1,
-            "region": "CH"
-        }
-        response = requests.get(TMDB_NOW_PLAYING_URL, params=params)
-        response.raise_for_status()
-        data = response.json()
-
-        # Ensure the 'results' key exists in the API response
-        if 'results' not in data:
-            raise ValueError("Key 'results' missing in TMDB response")
-
-        # Limit the number of movies to process to 10
-        movies = data['results'][:10]
-
-        for movie in movies:
-            # Extract movie details from the API response
-            api_id = movie.get("id")
-            title = movie.get("title", "Unknown Title")
-            synopsis = movie.get("overview", "")[:500]
-            genre_ids = movie.get("genre_ids", [])
-
-            # Fetch the runtime of the movie
-            duration = fetch_movie_runtime(api_id)
-
-            # Convert genre IDs to genre names
-            type_movie = ", ".join(genre_mapping.get(g, f"Unknown Genre ({g})") for g in genre_ids)
-
-            release_date = movie.get("release_date", None)
-            picture_url = f"https://image.tmdb.org/t/p/w500{movie.get('poster_path')}" if movie.get("poster_path") else ""
-            rating = int(movie.get("vote_average", 0))
-
-            # Parse the release date if it exists
-            if release_date:
-                try:
-                    release_date = datetime.strptime(release_date, "%Y-%m-%d").date()
-                except ValueError:
-                    release_date = None
-
-            # Check if the movie already exists in the database
-            if not Movie.objects.filter(api_id=api_id).exists():
-                # Create a new movie record in the database
-                Movie.objects.create(
-                    title=title,
-                    synopsis=synopsis,
-                    duration=duration,
-                    type=type_movie,
-                    release_date=release_date,
-                    picture_url=picture_url,
-                    rating=rating,
-                    api_id=api_id
-                )
-                print(f"Movie added: {title} ({type_movie})")
-            else:
-                print(f"Movie already exists: {title}")
-
-        return f"{len(movies)} movies successfully added"
+        # Resume an interrupted run after its last stored page
+        checkpoint, _ = SyncCheckpoint.objects.get_or_create(name=NOW_PLAYING_SYNC)
+        page = checkpoint.last_page + 1 if checkpoint.in_progress else 1
+        if page > 1:
+            print(f"Resuming the synchronisation at page {page}")
+
+        totals = Counter(inserted=0, updated=0, unchanged=0, skipped=0)
+        total_pages = page
+        while page <= min(total_pages, TMDB_MAX_PAGES):
+            data = tmdb_get(TMDB_NOW_PLAYING_URL, page=page, region="CH")
+
+            # Ensure the 'results' key exists in the API response
+            if 'results' not in data:
+                raise ValueError("Key 'results' missing in TMDB response")
+            total_pages = data.get("total_pages", page)
+
+            to_store, genres_by_movie, counts = prepare_movies(data["results"], genre_mapping)
+            totals.update(counts)
+
+            if to_store:
+                # Store the page and move the checkpoint atomically
+                with transaction.atomic():
+                    totals.update(upsert_movies(to_store))
+                    set_movie_genres(genres_by_movie)
+                    SyncCheckpoint.objects.filter(pk=checkpoint.pk).update(last_page=page, in_progress=True)
+            page += 1
+
+        # Mark the run as complete
+        SyncCheckpoint.objects.filter(pk=checkpoint.pk).update(
+            last_page=0, in_progress=False, last_run_at=timezone.now()
+        )
+
+        return (
+            f"{totals['inserted']} movies added, {totals['updated']} updated, "
+            f"{totals['unchanged']} unchanged, {totals['skipped']} skipped"
+        )
 
     except requests.exceptions.RequestException as e:
         return f"TMDB request error: {str(e)}"
@@ -133,3 +262,13 @@ def fetch_and_store_movies():
         return f"Data format error: {str(e)}"
     except Exception as e:
         return f"Unexpected error: {str(e)}"
+
+@shared_task
+def release_expired_baskets():
+    """
+    Give back the seats of abandoned baskets whose hold has expired.
+    Scheduled every minute by the `schedule_tasks` command; between two runs the
+    expired seats are already counted as available by the session list.
+    """
+    released = release_expired_holds()
+    return f"{released} expired basket lines released"
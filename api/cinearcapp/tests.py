@@ -1,3 +1,1484 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time as dt_time, timedelta
+from io import BytesIO, StringIO
+from decimal import Decimal
+from unittest import mock
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, router
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.translation import gettext_lazy
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.serializers import ListSerializer
+from django.test import AsyncClient
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from . import tasks
+from .authentication import user_stamp
+from .cache import MODIFIED_KEY, VERSION_KEY
+from .holds import release_expired_holds
+from .ingestion import set_movie_genres, store_genres, upsert_movies
+from .models import Genre, Movie, Room, Session, Basket, Order, SyncCheckpoint
+from .renderers import ORJSONParser, ORJSONRenderer
+from .routers import replica_reads
+from .serializers import MovieSerializer, SessionSerializer
+from .payments import FakeProvider, PaymentError, PaymentProvider, StripeProvider, get_payment_provider
+from .scheduling import plan_schedule
+from .search import edit_distance
+from .throttling import MemoryBuckets, RedisBuckets, get_buckets
 
-# Create your tests here.
+User = get_user_model()
+
+
+def create_movie(api_id, title="Film", duration=120):
+    """Create a movie with default values for the fields the tests don't care about."""
+    return Movie.objects.create(
+        title=title,
+        synopsis="Synopsis",
+        duration=duration,
+        type="Action",
+        release_date=date(2025, 1, 1),
+        picture_url="",
+        rating=7,
+        api_id=api_id,
+    )
+
+
+class SessionFilterTests(TestCase):
+    """Query parameter filtering of GET /api/sessions/."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.movie_a = create_movie(1, "A")
+        cls.movie_b = create_movie(2, "B")
+        cls.room_1 = Room.objects.create(name="Salle 1", capacity=100)
+        cls.room_2 = Room.objects.create(name="Salle 2", capacity=50)
+
+        now = timezone.now()
+        cls.past = Session.objects.create(movie=cls.movie_a, room=cls.room_1, date_hour=now - timedelta(days=1))
+        cls.soon = Session.objects.create(movie=cls.movie_a, room=cls.room_1, date_hour=now + timedelta(days=1))
+        cls.later = Session.objects.create(movie=cls.movie_a, room=cls.room_2, date_hour=now + timedelta(days=10))
+        cls.other = Session.objects.create(movie=cls.movie_b, room=cls.room_2, date_hour=now + timedelta(days=2))
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get_ids(self, params=None):
+        response = self.client.get("/api/sessions/", params or {})
+        self.assertEqual(response.status_code, 200)
+        return [session["id"] for session in response.json()["results"]]
+
+    def test_past_sessions_are_hidden_by_default(self):
+        self.assertEqual(self.get_ids(), [self.soon.id, self.other.id, self.later.id])
+
+    def test_filter_by_movie_and_room(self):
+        self.assertEqual(self.get_ids({"movie": self.movie_a.id}), [self.soon.id, self.later.id])
+        self.assertEqual(self.get_ids({"room": self.room_2.id}), [self.other.id, self.later.id])
+        self.assertEqual(self.get_ids({"movie": self.movie_a.id, "room": self.room_2.id}), [self.later.id])
+
+    def test_date_range(self):
+        start = (timezone.localdate() - timedelta(days=5)).isoformat()
+        end = (timezone.localdate() + timedelta(days=5)).isoformat()
+        self.assertEqual(self.get_ids({"from": start, "to": end}), [self.past.id, self.soon.id, self.other.id])
+
+    def test_invalid_parameters_are_rejected(self):
+        self.assertEqual(self.client.get("/api/sessions/", {"movie": "abc"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/sessions/", {"from": "2025-13-45"}).status_code, 400)
+
+    def test_detail_still_reaches_past_sessions(self):
+        self.assertEqual(self.client.get(f"/api/sessions/{self.past.id}/").status_code, 200)
+
+
+class PaginationTests(TestCase):
+    """Keyset pagination of the list endpoints."""
+
+    @classmethod
+    def setUpTestData(cls):
+        room = Room.objects.create(name="Salle 1", capacity=100)
+        movie = create_movie(1)
+        start = timezone.now() + timedelta(days=1)
+        # Created in reverse chronological order so that id and date_hour orders differ
+        cls.sessions = [
+            Session.objects.create(movie=movie, room=room, date_hour=start + timedelta(hours=5 - i)) for i in range(5)
+        ]
+        for i in range(2, 7):
+            create_movie(i)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def walk(self, url, params):
+        """Follow the `next` links and return every page."""
+        pages = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.json())
+            if not pages[-1]["next"]:
+                return pages
+            response = self.client.get(pages[-1]["next"])
+
+    def test_sessions_are_paged_in_chronological_order(self):
+        pages = self.walk("/api/sessions/", {"page_size": 2})
+        self.assertEqual([len(page["results"]) for page in pages], [2, 2, 1])
+        ids = [session["id"] for page in pages for session in page["results"]]
+        self.assertEqual(ids, [session.id for session in reversed(self.sessions)])
+
+    def test_count_is_only_returned_on_demand(self):
+        self.assertNotIn("count", self.client.get("/api/movies/").json())
+        response = self.client.get("/api/movies/", {"count": "true", "page_size": 4})
+        self.assertEqual(response.json()["count"], 6)
+        self.assertEqual(len(response.json()["results"]), 4)
+
+
+class SeatInventoryTests(TestCase):
+    """Seat counter maintained by the basket endpoints."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="buyer", email="buyer@example.com", password="secret!123")
+        cls.room = Room.objects.create(name="Salle 1", capacity=10)
+        cls.session = Session.objects.create(
+            movie=create_movie(1), room=cls.room, date_hour=timezone.now() + timedelta(days=1)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def seats(self):
+        self.session.refresh_from_db()
+        return self.session.available_seats
+
+    def add(self, quantity):
+        return self.client.post(
+            "/api/basket/", {"session_id": self.session.id, "user_id": self.user.id, "quantity": quantity}
+        )
+
+    def test_new_session_starts_at_room_capacity(self):
+        self.assertEqual(self.seats(), 10)
+
+    def test_moving_the_session_keeps_its_taken_seats(self):
+        self.add(4)
+        url = f"/api/sessions/{self.session.id}/"
+        larger, smaller = Room.objects.create(name="Salle 2", capacity=30), Room.objects.create(name="Salle 3", capacity=3)
+        self.assertEqual(self.client.patch(url, {"room_id": larger.id}).status_code, 200)
+        self.assertEqual(self.seats(), 26)
+        self.assertEqual(self.client.patch(url, {"room_id": smaller.id}).status_code, 400)
+        self.assertEqual(self.seats(), 26)
+        self.assertEqual(self.client.patch(url, {"room_id": self.room.id}).status_code, 200)
+        self.assertEqual(self.seats(), 6)
+
+    def test_reserve_update_and_release(self):
+        basket_id = self.add(4).json()["id"]
+        self.assertEqual(self.seats(), 6)
+
+        self.client.patch(f"/api/basket/{basket_id}/", {"quantity": 7})
+        self.assertEqual(self.seats(), 3)
+        self.client.patch(f"/api/basket/{basket_id}/", {"quantity": 2})
+        self.assertEqual(self.seats(), 8)
+
+        self.client.delete(f"/api/basket/{basket_id}/")
+        self.assertEqual(self.seats(), 10)
+
+    def test_cannot_reserve_more_than_available(self):
+        self.assertEqual(self.add(8).status_code, 201)
+        response = self.add(3)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Basket.objects.count(), 1)
+        self.assertEqual(self.seats(), 2)
+
+
+    def test_add_action_upserts_the_line(self):
+        response = self.client.post("/api/basket/add/", {"session_id": self.session.id, "quantity": 2})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(set(response.json()), {"id", "session_id", "quantity", "held_until"})
+
+        response = self.client.post("/api/basket/add/", {"session_id": self.session.id, "quantity": 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["quantity"], 5)
+        self.assertEqual(Basket.objects.get().user, self.user)
+        self.assertEqual(self.seats(), 5)
+
+    def test_add_action_rejects_sold_out_and_unknown_sessions(self):
+        self.assertEqual(self.client.post("/api/basket/add/", {"session_id": self.session.id, "quantity": 11}).status_code, 400)
+        self.assertEqual(self.client.post("/api/basket/add/", {"session_id": 999, "quantity": 1}).status_code, 404)
+        self.assertEqual(self.client.post("/api/basket/add/", {"session_id": self.session.id, "quantity": 0}).status_code, 400)
+        self.assertFalse(Basket.objects.exists())
+        self.assertEqual(self.seats(), 10)
+
+    def test_duplicate_unpaid_line_is_rejected(self):
+        self.assertEqual(self.add(1).status_code, 201)
+        self.assertEqual(self.add(1).status_code, 400)
+        self.assertEqual(self.seats(), 9)
+
+class SeatConcurrencyTests(TransactionTestCase):
+    """Parallel buyers racing for the last seats of a session."""
+
+    def test_parallel_buyers_never_oversell(self):
+        room = Room.objects.create(name="Salle 1", capacity=20)
+        session = Session.objects.create(movie=create_movie(1), room=room, date_hour=timezone.now() + timedelta(days=1))
+        users = User.objects.bulk_create([User(username=f"buyer{i}", email=f"buyer{i}@example.com") for i in range(100)])
+        start = threading.Event()
+
+        def buy(user):
+            client = APIClient()
+            client.force_authenticate(user)
+            start.wait()  # Release all buyers at once
+            try:
+                return client.post("/api/basket/", {"session_id": session.id, "user_id": user.id, "quantity": 1}).status_code
+            finally:
+                connection.close()  # Each worker thread owns its own connection
+
+        with ThreadPoolExecutor(max_workers=20) as pool:
+            futures = [pool.submit(buy, user) for user in users]
+            start.set()
+            results = [future.result() for future in futures]
+
+        session.refresh_from_db()
+        self.assertEqual(results.count(201), 20)
+        self.assertEqual(results.count(400), 80)  # Sold out
+        self.assertEqual(session.available_seats, 0)
+        self.assertEqual(Basket.objects.filter(session=session).count(), 20)
+
+
+class SeatHoldTests(TestCase):
+    """Unpaid basket lines hold their seats for a limited time."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="holder", email="holder@example.com", password="secret!123")
+        cls.room = Room.objects.create(name="Salle 1", capacity=10)
+        cls.session = Session.objects.create(
+            movie=create_movie(1), room=cls.room, date_hour=timezone.now() + timedelta(days=1)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def hold(self, quantity, minutes_ago):
+        """Reserve seats with a hold that expired `minutes_ago` minutes ago"""
+        self.session.reserve_seats(quantity)
+        user = User.objects.create_user(username=f"user{Basket.objects.count()}", password="secret!123")
+        return Basket.objects.create(
+            user=user, session=self.session, quantity=quantity,
+            held_until=timezone.now() - timedelta(minutes=minutes_ago),
+        )
+
+    def seats(self):
+        self.session.refresh_from_db()
+        return self.session.available_seats
+
+    def test_new_lines_are_held(self):
+        with self.settings(BASKET_HOLD_MINUTES=10):
+            response = self.client.post("/api/basket/add/", {"session_id": self.session.id, "quantity": 1})
+        held_until = Basket.objects.get(pk=response.json()["id"]).held_until
+        self.assertAlmostEqual(held_until, timezone.now() + timedelta(minutes=10), delta=timedelta(seconds=5))
+
+    def test_expired_seats_are_available_before_the_sweep(self):
+        self.hold(4, minutes_ago=1)
+        self.assertEqual(self.seats(), 6)
+
+        sessions = self.client.get("/api/sessions/").json()["results"]
+        self.assertEqual(sessions[0]["available_seats"], 10)
+        self.assertEqual(self.client.get(f"/api/sessions/{self.session.id}/").json()["available_seats"], 10)
+
+    def test_expired_lines_are_hidden_from_the_basket(self):
+        line = self.hold(2, minutes_ago=1)
+        line.user = self.user
+        line.save()
+        self.assertEqual(self.client.get("/api/basket/").json()["results"], [])
+
+        # Adding the session again starts a fresh line
+        response = self.client.post("/api/basket/add/", {"session_id": self.session.id, "quantity": 3})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["quantity"], 3)
+        self.assertEqual(self.seats(), 7)
+
+    def test_reservation_reclaims_expired_seats(self):
+        self.hold(10, minutes_ago=1)
+        self.assertEqual(self.seats(), 0)
+
+        response = self.client.post("/api/basket/add/", {"session_id": self.session.id, "quantity": 8})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.seats(), 2)
+        self.assertEqual(Basket.objects.count(), 1)
+
+    def test_sweep_releases_expired_lines_in_batches(self):
+        for minutes_ago in (1, 2, 3, 4, 5):
+            self.hold(1, minutes_ago=minutes_ago)
+        active = self.hold(2, minutes_ago=-10)
+        paid = self.hold(1, minutes_ago=60)
+        paid.payed = True
+        paid.save()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(release_expired_holds(batch_size=2), 5)
+
+        self.assertEqual(self.seats(), 7)
+        self.assertCountEqual(Basket.objects.values_list("pk", flat=True), [active.pk, paid.pk])
+        self.assertEqual(tasks.release_expired_baskets(), "0 expired basket lines released")
+
+
+@override_settings(PAYMENT_PROVIDER="fake")
+class CheckoutTests(TestCase):
+    """Checkout creation through the payment provider interface."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="payer", email="payer@example.com", password="secret!123")
+        movie = create_movie(1)
+        cls.sessions = [
+            Session.objects.create(
+                movie=movie, room=Room.objects.create(name=f"Salle {price}", capacity=10, price=price),
+                date_hour=timezone.now() + timedelta(days=1),
+            )
+            for price in (1600, 1250)
+        ]
+
+    def setUp(self):
+        get_buckets().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.provider = get_payment_provider()
+        self.provider.checkouts.clear()
+        self.provider.expired.clear()
+
+    def add(self, session, quantity):
+        return self.client.post("/api/basket/add/", {"session_id": session.id, "quantity": quantity})
+
+    def test_total_comes_from_the_room_prices(self):
+        self.add(self.sessions[0], 2)
+        self.add(self.sessions[1], 3)
+
+        response = self.client.get("/api/payment/checkout/")
+        self.assertEqual(response.status_code, 200)
+        (params, checkout), = self.provider.checkouts.values()
+        self.assertEqual(params[0], 2 * 1600 + 3 * 1250)
+        self.assertEqual(response.json()["checkout_url"], checkout.url)
+
+    def test_retries_reuse_the_checkout(self):
+        self.add(self.sessions[0], 1)
+        first = self.client.get("/api/payment/checkout/").json()
+        self.assertEqual(self.client.get("/api/payment/checkout/").json(), first)
+        self.assertEqual(len(self.provider.checkouts), 1)
+
+        # A changed basket is a new payment
+        self.add(self.sessions[0], 1)
+        self.assertNotEqual(self.client.get("/api/payment/checkout/").json(), first)
+        self.assertEqual(len(self.provider.checkouts), 2)
+
+    def test_a_new_basket_replaces_the_pending_checkout(self):
+        self.add(self.sessions[0], 1)
+        self.client.get("/api/payment/checkout/")
+        first = Order.objects.get()
+        self.add(self.sessions[1], 1)
+        self.client.get("/api/payment/checkout/")
+
+        first.refresh_from_db()
+        self.assertEqual(first.status, Order.Status.CANCELED)
+        self.assertEqual(self.provider.expired, {first.checkout_id})
+        self.assertEqual(Order.objects.filter(status=Order.Status.PENDING).count(), 1)
+
+    def test_checkout_close_to_its_deadline_is_recreated(self):
+        self.add(self.sessions[0], 1)
+        self.client.get("/api/payment/checkout/")
+        first = Order.objects.get()
+        Order.objects.filter(pk=first.pk).update(expires_at=timezone.now() + timedelta(minutes=20))
+        self.client.get("/api/payment/checkout/")
+
+        first.refresh_from_db()
+        self.assertEqual(first.status, Order.Status.CANCELED)
+        self.assertEqual(self.provider.expired, {first.checkout_id})
+        self.assertGreater(Order.objects.get(status=Order.Status.PENDING).expires_at, timezone.now() + timedelta(minutes=30))
+
+    def test_stripe_deadline_is_at_least_30_minutes_away(self):
+        with mock.patch("cinearcapp.payments.stripe") as stripe:
+            provider = StripeProvider("sk_test", "whsec", timeout=(1, 1), max_retries=0)
+            provider.create_checkout(1600, "chf", "key", "/ok", "/cancel", timezone.now() + timedelta(minutes=5))
+        expires_at = stripe.checkout.Session.create.call_args.kwargs["expires_at"]
+        self.assertGreaterEqual(expires_at, time.time() + 30 * 60)
+
+    def test_empty_basket_and_provider_errors(self):
+        self.assertEqual(self.client.get("/api/payment/checkout/").status_code, 400)
+
+        self.add(self.sessions[0], 1)
+        with mock.patch.object(FakeProvider, "create_checkout", side_effect=PaymentError("timeout")):
+            response = self.client.get("/api/payment/checkout/")
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(response.json(), {"error": "timeout"})
+
+    def test_providers_must_implement_create_checkout(self):
+        class IncompleteProvider(PaymentProvider):
+            pass
+
+        with self.assertRaises(TypeError):
+            IncompleteProvider()
+
+
+@override_settings(PAYMENT_PROVIDER="fake")
+class PaymentWebhookTests(TestCase):
+    """Orders confirmed by signed payment provider events."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="payer", email="payer@example.com", password="secret!123")
+        cls.session = Session.objects.create(
+            movie=create_movie(1), room=Room.objects.create(name="Salle 1", capacity=10),
+            date_hour=timezone.now() + timedelta(days=1),
+        )
+
+    def setUp(self):
+        get_buckets().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.provider = get_payment_provider()
+        self.client.post("/api/basket/add/", {"session_id": self.session.id, "quantity": 3})
+        self.client.get("/api/payment/checkout/")
+        self.order = Order.objects.get()
+
+    def send(self, event_type, signature=None, timestamp=None, **checkout):
+        checkout = {"id": self.order.checkout_id, "client_reference_id": str(self.order.pk), **checkout}
+        payload = json.dumps({"type": event_type, "data": {"object": checkout}}).encode()
+        return APIClient().post(
+            "/api/payment/webhook/", payload, content_type="application/json",
+            HTTP_STRIPE_SIGNATURE=signature or self.provider.sign(payload, timestamp),
+        )
+
+    def seats(self):
+        self.session.refresh_from_db()
+        return self.session.available_seats
+
+    def test_checkout_creates_a_pending_order(self):
+        self.assertEqual(self.order.status, Order.Status.PENDING)
+        self.assertEqual(self.order.amount, 3 * 1600)
+        self.assertTrue(self.order.checkout_id.startswith("cs_fake_"))
+        self.assertEqual(list(self.order.lines.values_list("session_id", "quantity", "unit_price")), [(self.session.id, 3, 1600)])
+        self.assertEqual(self.order.amount, sum(line.quantity * line.unit_price for line in self.order.lines.all()))
+        self.assertEqual(Basket.objects.get().held_until, self.order.expires_at)
+
+        # Retrying the checkout reuses the order
+        self.client.get("/api/payment/checkout/")
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_completed_checkout_sells_the_seats_once(self):
+        for _ in range(2):  # Duplicate delivery
+            response = self.send("checkout.session.completed", payment_status="paid")
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"message": "Order already handled."})
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.Status.PAID)
+        line = Basket.objects.get()
+        self.assertTrue(line.payed)
+        self.assertIsNone(line.held_until)
+        self.assertEqual(self.seats(), 7)
+        self.assertEqual(self.client.post("/api/payment/success/").json()["status"], "paid")
+
+    def test_lines_held_as_charged_are_sold_without_moving_seats(self):
+        with mock.patch.object(Session, "reserve_seats") as reserve, mock.patch.object(Session, "release_seats") as release:
+            self.send("checkout.session.completed", payment_status="paid")
+        reserve.assert_not_called()
+        release.assert_not_called()
+        self.assertTrue(Basket.objects.get().payed)
+
+    def test_swept_lines_take_their_seats_again(self):
+        Basket.objects.update(held_until=timezone.now() - timedelta(minutes=1))
+        release_expired_holds()
+        self.assertEqual(self.seats(), 10)
+
+        self.send("checkout.session.completed", payment_status="paid")
+        line = Basket.objects.get()
+        self.assertTrue(line.payed)
+        self.assertEqual(line.quantity, 3)
+        self.assertEqual(self.seats(), 7)
+
+    def test_lines_edited_during_the_checkout_are_sold_as_charged(self):
+        # Paid for 3, raised to 5 while the checkout was pending
+        self.client.post("/api/basket/add/", {"session_id": self.session.id, "quantity": 2})
+        self.assertEqual(self.seats(), 5)
+
+        self.send("checkout.session.completed", payment_status="paid")
+        line = Basket.objects.get()
+        self.assertTrue(line.payed)
+        self.assertEqual(line.quantity, 3)
+        self.assertEqual(self.seats(), 7)  # The 2 extra seats are free again
+
+    def test_lines_lowered_or_moved_during_the_checkout_are_sold_as_charged(self):
+        other = Session.objects.create(
+            movie=self.session.movie, room=Room.objects.create(name="Salle 2", capacity=10),
+            date_hour=timezone.now() + timedelta(days=2),
+        )
+        line = Basket.objects.get()
+        self.client.patch(f"/api/basket/{line.id}/", {"session_id": other.id, "quantity": 1})
+        self.assertEqual((self.seats(), Session.objects.get(pk=other.pk).available_seats), (10, 9))
+
+        self.send("checkout.session.completed", payment_status="paid")
+        line.refresh_from_db()
+        self.assertEqual((line.session_id, line.quantity, line.payed), (self.session.id, 3, True))
+        self.assertEqual((self.seats(), Session.objects.get(pk=other.pk).available_seats), (7, 10))
+
+    def test_lines_paid_by_two_checkouts_are_sold_twice(self):
+        # Checked out with 3 tickets, then with 1 more, and both checkouts paid
+        self.client.post("/api/basket/add/", {"session_id": self.session.id, "quantity": 1})
+        self.client.get("/api/payment/checkout/")
+        second = Order.objects.exclude(pk=self.order.pk).get()
+        self.send("checkout.session.completed", payment_status="paid")
+        self.order = second
+        self.send("checkout.session.completed", payment_status="paid")
+
+        self.assertEqual(sorted(Basket.objects.filter(payed=True).values_list("quantity", flat=True)), [3, 4])
+        self.assertEqual(self.seats(), 3)
+
+    def test_expired_checkout_cancels_the_order(self):
+        self.send("checkout.session.expired")
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.Status.CANCELED)
+        self.assertFalse(Basket.objects.get().payed)
+
+        # A payment confirmed anyway (checkout replaced while being paid) is still honored
+        self.send("checkout.session.completed", payment_status="paid")
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.Status.PAID)
+        self.assertTrue(Basket.objects.get().payed)
+        self.assertEqual(self.seats(), 7)
+
+    def test_unpaid_and_unsigned_events_change_nothing(self):
+        self.assertEqual(self.send("checkout.session.completed", payment_status="unpaid").status_code, 200)
+        self.assertEqual(self.send("checkout.session.completed", signature="t=1,v1=forged", payment_status="paid").status_code, 400)
+        replayed = self.send("checkout.session.completed", timestamp=int(time.time()) - 3600, payment_status="paid")
+        self.assertEqual(replayed.status_code, 400)
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.Status.PENDING)
+        self.assertFalse(Basket.objects.get().payed)
+
+    def test_success_endpoint_does_not_confirm_payments(self):
+        response = self.client.post("/api/payment/success/")
+        self.assertEqual(response.json()["status"], "pending")
+        self.assertFalse(Basket.objects.get().payed)
+
+
+class ThrottleTests(TestCase):
+    """Token bucket throttles of the expensive endpoints."""
+
+    def setUp(self):
+        get_buckets().clear()
+
+    def login(self, ip):
+        return APIClient(REMOTE_ADDR=ip).post("/api/auth/login/", {"email": "nobody@example.com", "password": "x"})
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {"login": "3/min"}})
+    def test_login_is_throttled_per_ip(self):
+        self.assertEqual([self.login("10.0.0.1").status_code for _ in range(4)], [401, 401, 401, 429])
+        self.assertEqual(self.login("10.0.0.2").status_code, 401)  # Other clients keep their own bucket
+        self.assertIn(self.login("10.0.0.1")["Retry-After"], ("19", "20"))  # One request every 20 s
+
+    @override_settings(
+        PAYMENT_PROVIDER="fake",
+        REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {"checkout": "1/min"}},
+    )
+    def test_checkout_is_throttled_per_user(self):
+        clients = []
+        for name in ("first", "second"):
+            client = APIClient()
+            client.force_authenticate(User.objects.create_user(username=name, password="secret!123"))
+            clients.append(client)
+        self.assertEqual(clients[0].get("/api/payment/checkout/").status_code, 400)  # Empty basket
+        self.assertEqual(clients[0].get("/api/payment/checkout/").status_code, 429)
+        self.assertEqual(clients[1].get("/api/payment/checkout/").status_code, 400)
+
+    def test_bucket_refills_over_time(self):
+        buckets = MemoryBuckets()
+        with mock.patch("cinearcapp.throttling.time.monotonic", side_effect=[0, 0, 0, 5]):
+            results = [buckets.take("key", 2, 0.2) for _ in range(4)]  # Burst of 2, one token every 5 s
+        self.assertEqual(results, [(True, 0.0), (True, 0.0), (False, 5.0), (True, 0.0)])
+
+    def test_redis_buckets_clear_only_deletes_the_buckets(self):
+        with mock.patch("redis.Redis.from_url") as from_url:
+            client = from_url.return_value
+            client.scan_iter.return_value = iter([b"throttle:login:ip:10.0.0.1", b"throttle:checkout:user:1"])
+            RedisBuckets("redis://cache:6379/0").clear()
+        client.scan_iter.assert_called_once_with(match="throttle:*", count=1000)
+        client.delete.assert_called_once_with(b"throttle:login:ip:10.0.0.1", b"throttle:checkout:user:1")
+
+
+class QueryCountTests(TestCase):
+    """Every list and detail endpoint runs a fixed number of queries, whatever the page size."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="buyer", email="buyer@example.com", password="secret!123")
+        start = timezone.now() + timedelta(days=1)
+        for i in range(10):
+            room = Room.objects.create(name=f"Salle {i}", capacity=100)
+            session = Session.objects.create(movie=create_movie(i), room=room, date_hour=start + timedelta(hours=i))
+            Basket.objects.create(session=session, user=cls.user, quantity=1)
+        cls.session = session
+        cls.basket = Basket.objects.last()
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertQueries(self, url, expected, **params):
+        """Assert the query count for a small and a full page."""
+        for page_size in (1, 10):
+            with self.assertNumQueries(expected):
+                response = self.client.get(url, {"page_size": page_size, **params})
+            self.assertEqual(response.status_code, 200)
+
+    def test_list_endpoints(self):
+        # Full movies (also nested in baskets) need one more query to prefetch their genres,
+        # the compact catalog lists leave them out
+        expected = {"/api/movies/": 1, "/api/room/": 1, "/api/sessions/": 1, "/api/users/": 1, "/api/basket/": 2}
+        for url, queries in expected.items():
+            with self.subTest(url=url):
+                self.assertQueries(url, queries)
+        self.assertQueries("/api/movies/", 2, fields="all")
+        self.assertQueries("/api/sessions/", 2, expand="movie")
+
+    def test_detail_endpoints(self):
+        self.assertQueries(f"/api/movies/{self.session.movie_id}/", 2)
+        self.assertQueries(f"/api/room/{self.session.room_id}/", 1)
+        self.assertQueries(f"/api/sessions/{self.session.id}/", 2)
+        self.assertQueries(f"/api/users/{self.user.id}/", 1)
+        self.assertQueries(f"/api/basket/{self.basket.id}/", 2)
+
+class SparseFieldsTests(TestCase):
+    """Compact catalog lists, `?fields=` and `?expand=`."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.room = Room.objects.create(name="Salle 1", capacity=100)
+        cls.movie = create_movie(1)
+        cls.session = Session.objects.create(
+            movie=cls.movie, room=cls.room, date_hour=timezone.now() + timedelta(days=1), available_seats=100
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_movie_list_is_compact_and_detail_is_full(self):
+        listed = self.client.get("/api/movies/").data["results"][0]
+        self.assertEqual(set(listed), {"id", "title", "picture_url", "rating", "type"})
+        detail = self.client.get(f"/api/movies/{self.movie.id}/").data
+        self.assertIn("synopsis", detail)
+        self.assertIn("genres", detail)
+
+    def test_fields_trim_the_payload_and_the_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/movies/", {"fields": "id,title"})
+        self.assertEqual(response.data["results"], [{"id": self.movie.id, "title": self.movie.title}])
+        self.assertNotIn("synopsis", queries[0]["sql"])
+
+        response = self.client.get(f"/api/movies/{self.movie.id}/", {"fields": "title"})
+        self.assertEqual(response.data, {"title": self.movie.title})
+
+    def test_sessions_nest_compact_objects_unless_expanded(self):
+        listed = self.client.get("/api/sessions/").data["results"][0]
+        self.assertEqual(set(listed), {"id", "movie", "room", "date_hour", "available_seats"})
+        self.assertEqual(set(listed["movie"]), {"id", "title", "picture_url", "rating", "type"})
+        self.assertEqual(listed["room"], {"id": self.room.id, "name": "Salle 1"})
+
+        expanded = self.client.get("/api/sessions/", {"expand": "movie,room"}).data["results"][0]
+        self.assertIn("synopsis", expanded["movie"])
+        self.assertEqual(expanded["room"]["capacity"], 100)
+
+    def test_sessions_without_their_relations_skip_the_joins(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/sessions/", {"fields": "id,date_hour,available_seats"})
+        self.assertEqual(set(response.data["results"][0]), {"id", "date_hour", "available_seats"})
+        self.assertEqual(response.data["results"][0]["available_seats"], 100)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("JOIN", queries[0]["sql"])
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get("/api/movies/", {"fields": "id,budget"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("budget", response.data["fields"])
+
+class FastJSONTests(TestCase):
+    """orjson renderer and parser, and the read-only list serializer."""
+
+    @classmethod
+    def setUpTestData(cls):
+        genre = Genre.objects.create(api_id=28, name="Action")
+        room = Room.objects.create(name="Salle 1", capacity=80)
+        for i in range(3):
+            movie = create_movie(i, title=f"Film {i}")
+            movie.genres.add(genre)
+            Session.objects.create(movie=movie, room=room, date_hour=timezone.now() + timedelta(hours=i + 1), available_seats=80)
+
+    def test_list_serializer_matches_drf(self):
+        for serializer_class, queryset in (
+            (MovieSerializer, Movie.objects.prefetch_related("genres")),
+            (SessionSerializer, Session.objects.select_related("movie", "room").prefetch_related("movie__genres")),
+        ):
+            with self.subTest(serializer=serializer_class.__name__):
+                fast = serializer_class(queryset, many=True)
+                reference = ListSerializer(queryset, child=serializer_class())
+                self.assertEqual(fast.data, reference.data)
+                self.assertEqual(len(fast.data), 3)
+
+        compact = SessionSerializer(Session.objects.all(), many=True, expand=[]).data
+        self.assertEqual(compact, ListSerializer(Session.objects.all(), child=SessionSerializer(expand=[])).data)
+
+        with timezone.override("Europe/Zurich"):
+            local = SessionSerializer(Session.objects.all(), many=True, fields=["date_hour"]).data
+            self.assertEqual(local, ListSerializer(Session.objects.all(), child=SessionSerializer(fields=["date_hour"])).data)
+            self.assertTrue(local[0]["date_hour"].endswith(("+01:00", "+02:00")))
+
+    def test_renderer_matches_drf(self):
+        data = {"price": Decimal("16.00"), "label": gettext_lazy("Active"), "when": date(2025, 1, 1), 1: ["é", None]}
+        self.assertEqual(json.loads(ORJSONRenderer().render(data)), json.loads(JSONRenderer().render(data)))
+        self.assertEqual(ORJSONRenderer().render(None), b"")
+        indented = ORJSONRenderer().render({"a": 1}, "application/json; indent=4")
+        self.assertEqual(indented, b'{\n  "a": 1\n}')
+
+    def test_parser(self):
+        self.assertEqual(ORJSONParser().parse(BytesIO('{"title": "Été"}'.encode())), {"title": "Été"})
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(BytesIO(b"{oops"))
+
+    def test_api_round_trip(self):
+        cache.clear()
+        get_buckets().clear()
+        client = APIClient()
+        response = client.post("/api/auth/login/", '{"email": ', content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        response = client.get("/api/sessions/")
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(len(json.loads(response.content)["results"]), 3)
+
+@override_settings(DATABASE_REPLICAS=["replica1", "replica2"])
+class RouterTests(SimpleTestCase):
+    """Primary / replica routing (no query is run, only the chosen aliases are checked)."""
+
+    def test_reads_go_to_the_primary_by_default(self):
+        self.assertEqual(Movie.objects.all().db, "default")
+
+    def test_replica_reads(self):
+        with replica_reads():
+            self.assertIn(Movie.objects.all().db, ["replica1", "replica2"])
+            self.assertEqual(Session.objects.select_for_update().db, "default")  # Locks are writes
+        self.assertEqual(Movie.objects.all().db, "default")
+
+    def test_writes_and_transactions_stay_on_the_primary(self):
+        with replica_reads():
+            self.assertEqual(router.db_for_write(Movie), "default")
+            with mock.patch.object(connection, "in_atomic_block", True):
+                self.assertEqual(Movie.objects.all().db, "default")
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(router.allow_migrate("replica1", "cinearcapp"))
+        self.assertTrue(router.allow_migrate("default", "cinearcapp"))
+
+class ReplicaViewTests(TransactionTestCase):
+    """Catalog reads go to the replicas, except right after a change. The primary stands in for the replica."""
+
+    def setUp(self):
+        cache.clear()
+        create_movie(1)
+        self.client = APIClient()
+
+    def replica_used(self, url):
+        with mock.patch("cinearcapp.routers.random.choice", side_effect=lambda aliases: aliases[0]) as choice:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return choice.called
+
+    @override_settings(DATABASE_REPLICAS=["default"], REPLICA_LAG_TOLERANCE=0)
+    def test_catalog_reads_use_the_replicas(self):
+        self.assertTrue(self.replica_used("/api/movies/"))
+
+    @override_settings(DATABASE_REPLICAS=["default"], REPLICA_LAG_TOLERANCE=60)
+    def test_recent_changes_are_read_from_the_primary(self):
+        self.assertFalse(self.replica_used("/api/movies/"))
+
+    @override_settings(DATABASE_REPLICAS=["default"], REPLICA_LAG_TOLERANCE=60)
+    def test_seat_changes_dont_keep_the_sessions_on_the_primary(self):
+        room = Room.objects.create(name="Salle 1", capacity=100)
+        session = Session.objects.create(movie=Movie.objects.get(), room=room, date_hour=timezone.now() + timedelta(days=1))
+        session.reserve_seats(2)
+        past = int(time.time()) - 120
+        cache.set_many({MODIFIED_KEY.format(table=table): past for table in ("session", "movie", "room")}, None)
+
+        for url in ("/api/sessions/", f"/api/async/movies/{session.movie_id}/sessions/"):
+            with self.subTest(url=url):
+                self.assertTrue(self.replica_used(url))
+                response = self.client.get(url)
+                self.assertEqual(response.json()["results"][0]["available_seats"], 98)
+                self.assertNotIn("Last-Modified", response)  # Only the slot ETag, the replica may lag
+
+        cache.set(MODIFIED_KEY.format(table="seats"), past, None)
+        self.assertIn("Last-Modified", self.client.get("/api/sessions/"))
+
+    @override_settings(DATABASE_REPLICAS=["default"], REPLICA_LAG_TOLERANCE=0)
+    def test_baskets_are_read_from_the_primary(self):
+        user = User.objects.create_user(username="buyer", email="buyer@example.com", password="secret!123")
+        self.client.force_authenticate(user)
+        self.assertFalse(self.replica_used("/api/basket/"))
+
+class AsyncViewTests(TestCase):
+    """Async read endpoints, same representations as the sync viewsets."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="buyer", email="buyer@example.com", password="secret!123")
+        room = Room.objects.create(name="Salle 1", capacity=80)
+        cls.movies = [create_movie(i, title=f"Film {i}") for i in range(3)]
+        start = timezone.now() + timedelta(days=1)
+        cls.sessions = [
+            Session.objects.create(movie=cls.movies[0], room=room, date_hour=start + timedelta(hours=i % 2), available_seats=80)
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = AsyncClient()
+
+    async def test_movie_list_pages_like_the_viewset(self):
+        response = await self.client.get("/api/async/movies/", {"page_size": 2})
+        self.assertEqual(response.status_code, 200)
+        page = json.loads(response.content)
+        self.assertEqual([movie["id"] for movie in page["results"]], [movie.id for movie in self.movies[:2]])
+        synced = await sync_to_async(APIClient().get)("/api/movies/", {"page_size": 2})
+        self.assertEqual(page["results"], json.loads(synced.content)["results"])
+
+        response = await self.client.get(page["next"])
+        page = json.loads(response.content)
+        self.assertEqual([movie["id"] for movie in page["results"]], [self.movies[2].id])
+        self.assertIsNone(page["next"])
+
+    async def test_movie_detail(self):
+        response = await self.client.get(f"/api/async/movies/{self.movies[0].id}/")
+        self.assertEqual(json.loads(response.content)["synopsis"], "Synopsis")
+        etag = response["ETag"]
+        response = await self.client.get(f"/api/async/movies/{self.movies[0].id}/", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        response = await self.client.get("/api/async/movies/999999/")
+        self.assertEqual(response.status_code, 404)
+
+    async def test_movie_sessions_in_chronological_pages(self):
+        url = f"/api/async/movies/{self.movies[0].id}/sessions/"
+        ids = []
+        response = await self.client.get(url, {"page_size": 2})
+        while True:
+            page = json.loads(response.content)
+            ids += [session["id"] for session in page["results"]]
+            if page["next"] is None:
+                break
+            response = await self.client.get(page["next"])
+        # Two sessions share the first start time, ties follow the id
+        expected = sorted(self.sessions, key=lambda session: (session.date_hour, session.id))
+        self.assertEqual(ids, [session.id for session in expected])
+        self.assertEqual(page["results"][0]["room"], {"id": self.sessions[0].room_id, "name": "Salle 1"})
+
+    async def test_current_user(self):
+        response = await self.client.get("/api/async/auth/user/")
+        self.assertEqual(response.status_code, 401)
+        token = await sync_to_async(lambda: str(RefreshToken.for_user(self.user).access_token))()
+        response = await self.client.get("/api/async/auth/user/", headers={"Authorization": f"Bearer {token}"})
+        self.assertEqual(json.loads(response.content)["email"], "buyer@example.com")
+        response = await self.client.get("/api/async/auth/user/", headers={"Authorization": "Bearer nope"})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_only_reads(self):
+        response = await self.client.post("/api/async/movies/")
+        self.assertEqual(response.status_code, 405)
+
+class AccountTests(TestCase):
+    """Registration and email login."""
+
+    def setUp(self):
+        get_buckets().clear()
+        self.client = APIClient()
+
+    def register(self, username, email, password="Cinema-2025!"):
+        return self.client.post("/api/auth/register/", {"username": username, "email": email, "password": password})
+
+    def test_login_is_a_single_query(self):
+        self.register("alice", "Alice@Example.com")
+        with self.assertNumQueries(1):
+            response = self.client.post("/api/auth/login/", {"email": "alice@example.COM", "password": "Cinema-2025!"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["user"]["username"], "alice")
+
+    def test_login_failures_do_not_tell_which_field_is_wrong(self):
+        self.register("alice", "alice@example.com")
+        wrong_password = self.client.post("/api/auth/login/", {"email": "alice@example.com", "password": "nope"})
+        unknown_email = self.client.post("/api/auth/login/", {"email": "bob@example.com", "password": "nope"})
+        self.assertEqual(wrong_password.status_code, 401)
+        self.assertEqual(wrong_password.json(), unknown_email.json())
+
+    def test_duplicate_email_is_rejected_by_the_database(self):
+        self.assertEqual(self.register("alice", "alice@example.com").status_code, 201)
+        response = self.register("alice2", "ALICE@example.com")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_taken_username_gets_a_suffix(self):
+        self.register("Alice Martin", "alice@example.com")
+        self.assertEqual(self.register("Alice Martin", "other@example.com").status_code, 201)
+        usernames = sorted(User.objects.values_list("username", flat=True))
+        self.assertEqual(usernames[0], "Alice Martin")
+        self.assertRegex(usernames[1], r"^alice-martin_[0-9a-f]{6}$")
+
+    def test_users_without_email_can_coexist(self):
+        User.objects.create_user(username="staff1", password="secret!123")
+        User.objects.create_user(username="staff2", password="secret!123")
+        self.assertEqual(User.objects.filter(email="").count(), 2)
+
+
+class CachedAuthenticationTests(TestCase):
+    """JWT users resolved from the cache."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="cached", email="cached@example.com", password="secret!123")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_user_info_without_database_hit(self):
+        with self.assertNumQueries(1):
+            self.client.get("/api/auth/user/")
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/auth/user/")
+        self.assertEqual(response.json()["email"], "cached@example.com")
+
+    def test_saving_the_user_invalidates_the_cache(self):
+        self.client.get("/api/auth/user/")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.email = "renamed@example.com"
+            self.user.save()
+        self.assertEqual(self.client.get("/api/auth/user/").json()["email"], "renamed@example.com")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.client.get("/api/auth/user/").status_code, 401)
+
+    def test_user_stamps_expire(self):
+        self.client.get("/api/auth/user/")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        keys = [key.format(table=user_stamp(self.user.pk)) for key in (VERSION_KEY, MODIFIED_KEY)]
+        self.assertEqual(len(cache.get_many(keys)), 2)
+        later = time.time() + 2 * settings.AUTH_USER_CACHE_TIMEOUT + 1
+        with mock.patch("django.core.cache.backends.locmem.time.time", return_value=later):
+            self.assertEqual(cache.get_many(keys), {})
+
+    def test_falls_back_to_the_database_when_the_cache_is_down(self):
+        with mock.patch("cinearcapp.authentication.get_stamps", side_effect=ConnectionError), \
+                self.assertLogs("cinearcapp.authentication", "ERROR"):
+            self.assertEqual(self.client.get("/api/auth/user/").status_code, 200)
+
+
+class CatalogCacheTests(TestCase):
+    """Versioned response cache of the catalog endpoints."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.movie = create_movie(1, "Avant")
+        cls.room = Room.objects.create(name="Salle 1", capacity=100)
+        cls.session = Session.objects.create(
+            movie=cls.movie, room=cls.room, date_hour=timezone.now() + timedelta(days=1)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_second_request_is_served_from_cache(self):
+        for url in ("/api/movies/", f"/api/movies/{self.movie.id}/", "/api/room/", "/api/sessions/"):
+            with self.subTest(url=url):
+                first = self.client.get(url).json()
+                with self.assertNumQueries(0):
+                    self.assertEqual(self.client.get(url).json(), first)
+
+    def test_saving_a_movie_invalidates_movie_and_session_responses(self):
+        self.client.get("/api/movies/")
+        self.client.get("/api/sessions/")
+        self.client.get("/api/room/")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.movie.title = "Après"
+            self.movie.save()
+
+        self.assertEqual(self.client.get("/api/movies/").json()["results"][0]["title"], "Après")
+        self.assertEqual(self.client.get("/api/sessions/").json()["results"][0]["movie"]["title"], "Après")
+        with self.assertNumQueries(0):
+            self.client.get("/api/room/")  # Rooms don't depend on movies
+
+    def test_deleting_a_session_invalidates_session_responses(self):
+        self.client.get("/api/sessions/")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.session.delete()
+        self.assertEqual(self.client.get("/api/sessions/").json()["results"], [])
+
+    def test_seat_reservation_invalidates_session_responses(self):
+        self.client.get("/api/sessions/")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.session.reserve_seats(3)
+        self.assertEqual(self.client.get("/api/sessions/").json()["results"][0]["available_seats"], 97)
+
+    def test_conditional_get_returns_not_modified(self):
+        response = self.client.get("/api/movies/")
+        etag = response["ETag"]
+        self.assertTrue(etag.startswith('"'))
+        self.assertIn("Last-Modified", response)
+
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/movies/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+        # A change to the table yields a new ETag and a full response
+        with self.captureOnCommitCallbacks(execute=True):
+            create_movie(2)
+        response = self.client.get("/api/movies/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_etag_depends_on_the_query(self):
+        self.assertNotEqual(
+            self.client.get("/api/sessions/")["ETag"],
+            self.client.get("/api/sessions/", {"movie": self.movie.id})["ETag"],
+        )
+
+
+class TMDBFetchTests(TestCase):
+    """Concurrent TMDB detail fetching."""
+
+    def test_failed_details_are_left_out_instead_of_defaulted(self):
+        def fake_runtime(movie_id):
+            if movie_id == 2:
+                raise requests.exceptions.ConnectionError("TMDB down")
+            return 100 + movie_id
+
+        with mock.patch.object(tasks, "fetch_movie_runtime", side_effect=fake_runtime):
+            self.assertEqual(tasks.fetch_movie_runtimes([1, 2, 3]), {1: 101, 3: 103})
+
+    def test_missing_runtime_defaults_to_90_minutes(self):
+        with mock.patch.object(tasks, "tmdb_get", return_value={"runtime": None}):
+            self.assertEqual(tasks.fetch_movie_runtime(1), 90)
+
+
+class MovieUpsertTests(TestCase):
+    """Bulk upsert of ingested movies."""
+
+    def build(self, api_id, rating=7):
+        return Movie(
+            title=f"Film {api_id}", synopsis="Synopsis", duration=100, type="Action",
+            release_date=date(2025, 1, 1), picture_url="", rating=rating, api_id=api_id,
+        )
+
+    def test_counts_and_refresh(self):
+        counts = upsert_movies([self.build(i) for i in range(1, 6)])
+        self.assertEqual(counts, {"inserted": 5, "updated": 0, "unchanged": 0})
+
+        counts = upsert_movies([self.build(i, rating=9 if i == 2 else 7) for i in range(1, 8)])
+        self.assertEqual(counts, {"inserted": 2, "updated": 1, "unchanged": 4})
+        self.assertEqual(Movie.objects.count(), 7)
+        self.assertEqual(Movie.objects.get(api_id=2).rating, 9)
+
+    def test_query_count_does_not_grow_with_the_catalog(self):
+        upsert_movies([self.build(i) for i in range(1, 80)])
+        # SAVEPOINT + SELECT + INSERT ... ON CONFLICT + RELEASE, for 2 as for 100 movies
+        for size in (2, 100):
+            with self.subTest(size=size), self.assertNumQueries(4):
+                upsert_movies([self.build(i, rating=size) for i in range(1, size + 1)])
+        self.assertEqual(Movie.objects.filter(rating=100).count(), 100)
+
+    def test_unchanged_catalog_writes_nothing(self):
+        upsert_movies([self.build(i) for i in range(1, 4)])
+        # SAVEPOINT + 1 SELECT + RELEASE
+        with self.assertNumQueries(3):
+            self.assertEqual(upsert_movies([self.build(i) for i in range(1, 4)])["unchanged"], 3)
+
+
+
+class MovieSearchTests(TestCase):
+    """Full-text search of the movie catalog."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.amelie = create_movie(1, "Le Fabuleux Destin d'Amélie Poulain")
+        cls.amelie.synopsis = "Une jeune serveuse de Montmartre décide de changer la vie des autres."
+        cls.amelie.save()
+        cls.serveuse = create_movie(2, "Mon amie la serveuse")
+        cls.dune = create_movie(3, "Dune : Deuxième partie")
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, text, **params):
+        response = self.client.get("/api/movies/", {"q": text, **params})
+        self.assertEqual(response.status_code, 200)
+        return [movie["title"] for movie in response.json()["results"]]
+
+    def test_accents_case_and_prefixes(self):
+        self.assertEqual(self.search("AMELIE"), ["Le Fabuleux Destin d'Amélie Poulain"])
+        self.assertEqual(self.search("deuxieme par"), ["Dune : Deuxième partie"])
+
+    def test_titles_rank_above_synopses(self):
+        self.assertEqual(self.search("serveuse"), ["Mon amie la serveuse", "Le Fabuleux Destin d'Amélie Poulain"])
+        self.assertEqual(self.search("serveuse", page_size=1), ["Mon amie la serveuse"])
+
+    def test_typos_are_tolerated(self):
+        self.assertEqual(self.search("fabuluex destin"), ["Le Fabuleux Destin d'Amélie Poulain"])
+        self.assertEqual(self.search("dnue"), [])  # The first two letters must be right
+        self.assertEqual(self.search("xyz"), [])
+
+    def test_index_follows_ingestion_writes(self):
+        upsert_movies([
+            Movie(api_id=3, title="Dune", synopsis="Arrakis", duration=155, type="", release_date=date(2021, 9, 15), picture_url="", rating=8),
+            Movie(api_id=4, title="Amélie", synopsis="", duration=100, type="", release_date=date(2001, 4, 25), picture_url="", rating=8),
+        ])
+        self.assertEqual(self.search("arrakis"), ["Dune"])
+        self.assertEqual(self.search("deuxieme"), [])
+        self.assertEqual(self.search("amelie")[0], "Amélie")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Movie.objects.filter(api_id=4).delete()
+        self.assertEqual(self.search("amelie"), ["Le Fabuleux Destin d'Amélie Poulain"])
+
+    def test_search_combines_with_the_genre_filter(self):
+        genre = Genre.objects.create(name="Drame")
+        self.serveuse.genres.add(genre)
+        self.assertEqual(self.search("serveuse", genre="Drame"), ["Mon amie la serveuse"])
+
+    def test_edit_distance(self):
+        self.assertEqual(edit_distance("fabuleux", "fabuluex", 2), 1)  # Swapped letters
+        self.assertEqual(edit_distance("dune", "dunes", 1), 1)
+        self.assertEqual(edit_distance("dune", "lune", 1), 1)
+        self.assertEqual(edit_distance("partie", "parties", 2), 1)
+        self.assertEqual(edit_distance("amelie", "poulain", 2), 3)
+
+
+class GenreTests(TestCase):
+    """Normalized genres: TMDB genre map, movie links and the ?genre= filter."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_genre_filter(self):
+        action, comedy = Genre.objects.create(name="Action"), Genre.objects.create(name="Comédie")
+        create_movie(1, "A").genres.set([action])
+        create_movie(2, "B").genres.set([action, comedy])
+        create_movie(3, "C")
+
+        def titles(genre):
+            return [movie["title"] for movie in self.client.get("/api/movies/", {"genre": genre}).json()["results"]]
+
+        self.assertEqual(titles("Action"), ["A", "B"])
+        self.assertEqual(titles(comedy.id), ["B"])
+        self.assertEqual(self.client.get(f"/api/movies/{comedy.movies.get().id}/").json()["genres"], ["Action", "Comédie"])
+
+    def test_set_movie_genres_replaces_links(self):
+        store_genres({28: "Action", 35: "Comédie", 12: "Aventure"})
+        movie = create_movie(1)
+        self.assertEqual(set_movie_genres({1: [28, 35]}), (2, 0))
+        self.assertEqual(set_movie_genres({1: [35, 12, 999]}), (1, 1))  # Unknown TMDB ids are ignored
+        self.assertEqual(sorted(movie.genres.values_list("name", flat=True)), ["Aventure", "Comédie"])
+
+    def test_genre_map_is_cached_in_the_database(self):
+        with mock.patch.object(tasks, "fetch_genres", return_value={28: "Action"}) as fetch:
+            self.assertEqual(tasks.get_genre_mapping(), {28: "Action"})
+            self.assertEqual(tasks.get_genre_mapping(), {28: "Action"})
+            self.assertEqual(fetch.call_count, 1)
+
+            # Refetched once the TTL has expired
+            Genre.objects.update(updated_at=timezone.now() - tasks.TMDB_GENRES_TTL - timedelta(minutes=1))
+            tasks.get_genre_mapping()
+            self.assertEqual(fetch.call_count, 2)
+
+    def test_tmdb_ids_are_attached_to_genres_parsed_from_type(self):
+        Genre.objects.create(name="Action")  # As created by the data migration
+        store_genres({28: "Action"})
+        self.assertEqual(Genre.objects.get().api_id, 28)
+
+    def test_genres_renamed_by_tmdb_keep_their_row(self):
+        store_genres({28: "Action", 35: "Comédie"})
+        movie = create_movie(1)
+        set_movie_genres({1: [28]})
+        store_genres({28: "Films d'action", 35: "Comédie"})
+        self.assertEqual(list(Genre.objects.order_by("api_id").values_list("api_id", "name")), [(28, "Films d'action"), (35, "Comédie")])
+        self.assertEqual(list(movie.genres.values_list("name", flat=True)), ["Films d'action"])
+
+
+class TMDBSyncTests(TestCase):
+    """Multi-page, incremental synchronisation of the now_playing catalog."""
+
+    def setUp(self):
+        cache.clear()
+        # Three pages of two movies
+        self.catalog = [
+            {"id": i, "title": f"Film {i}", "overview": "", "genre_ids": [28], "release_date": "2025-01-01",
+             "poster_path": "/p.jpg", "vote_average": 7.0}
+            for i in range(1, 7)
+        ]
+        self.fail_on_page = None
+        patches = [
+            mock.patch.object(tasks, "tmdb_get", side_effect=self.fake_tmdb_get),
+            mock.patch.object(tasks, "fetch_movie_runtimes", side_effect=lambda ids: {i: 100 for i in ids}),
+            mock.patch.object(tasks, "get_genre_mapping", return_value={28: "Action"}),
+        ]
+        self.tmdb_get, self.fetch_runtimes, _ = [patcher.start() for patcher in patches]
+        for patcher in patches:
+            self.addCleanup(patcher.stop)
+
+    def fake_tmdb_get(self, url, page, **params):
+        if page == self.fail_on_page:
+            raise requests.exceptions.ConnectionError("TMDB down")
+        return {"page": page, "total_pages": 3, "results": self.catalog[(page - 1) * 2:page * 2]}
+
+    def fetched_ids(self):
+        return [i for call in self.fetch_runtimes.call_args_list for i in call.args[0]]
+
+    def test_walks_every_page(self):
+        self.assertEqual(tasks.fetch_and_store_movies(), "6 movies added, 0 updated, 0 unchanged, 0 skipped")
+        self.assertEqual(Movie.objects.count(), 6)
+        self.assertFalse(SyncCheckpoint.objects.get().in_progress)
+
+    def test_unchanged_catalog_costs_no_detail_request_and_no_write(self):
+        tasks.fetch_and_store_movies()
+        self.fetch_runtimes.reset_mock()
+        self.catalog[4]["vote_average"] = 8.0
+
+        with CaptureQueriesContext(connection) as queries:
+            result = tasks.fetch_and_store_movies()
+
+        self.assertEqual(result, "0 movies added, 1 updated, 5 unchanged, 0 skipped")
+        self.assertEqual(self.fetched_ids(), [5])
+        movie_writes = [q["sql"] for q in queries if q["sql"].startswith(("INSERT", "UPDATE")) and "cinearcapp_movie" in q["sql"]]
+        self.assertEqual(len(movie_writes), 1)
+        self.assertEqual(Movie.objects.get(api_id=5).rating, 8)
+
+    def test_resumes_after_the_last_stored_page(self):
+        self.fail_on_page = 2
+        self.assertIn("TMDB request error", tasks.fetch_and_store_movies())
+        checkpoint = SyncCheckpoint.objects.get()
+        self.assertEqual((checkpoint.in_progress, checkpoint.last_page), (True, 1))
+
+        self.fail_on_page = None
+        self.tmdb_get.reset_mock()
+        tasks.fetch_and_store_movies()
+        self.assertEqual([call.kwargs["page"] for call in self.tmdb_get.call_args_list], [2, 3])
+        self.assertEqual(Movie.objects.count(), 6)
+        self.assertFalse(SyncCheckpoint.objects.get().in_progress)
+
+
+class ScheduleTests(TestCase):
+    """Weekly schedule planning (generate_schedule command)."""
+
+    def assertNoOverlap(self, sessions, buffer):
+        by_room = {}
+        for room_id, start, end in sessions:
+            by_room.setdefault(room_id, []).append((start, end))
+        for intervals in by_room.values():
+            intervals.sort()
+            for (_, end), (next_start, _) in zip(intervals, intervals[1:]):
+                self.assertLessEqual(end + buffer, next_start)
+
+    def test_plans_a_full_week_fast_and_without_overlap(self):
+        movies = [(i, 80 + 7 * i) for i in range(20)]
+        durations = dict(movies)
+        started = time.perf_counter()
+        planned = plan_schedule(movies, list(range(50)), date(2025, 3, 10), 7, dt_time(10), dt_time(23, 30), timedelta(minutes=15))
+        self.assertLess(time.perf_counter() - started, 1)
+
+        self.assertGreater(len(planned), 50 * 7 * 4)
+        sessions = [(room, start, start + timedelta(minutes=durations[movie])) for movie, room, start in planned]
+        self.assertNoOverlap(sessions, timedelta(minutes=15))
+        for _, start, end in sessions:
+            local_start, local_end = timezone.localtime(start), timezone.localtime(end)
+            self.assertGreaterEqual(local_start.time(), dt_time(10))
+            self.assertEqual(local_start.minute % 5, 0)
+            self.assertLessEqual(local_end, local_start.replace(hour=23, minute=30))
+
+    def test_command_keeps_existing_sessions(self):
+        movie = create_movie(1, duration=100)
+        room = Room.objects.create(name="Salle 1", capacity=80)
+        existing = Session.objects.create(
+            movie=movie, room=room, date_hour=timezone.make_aware(datetime(2025, 3, 10, 15, 0))
+        )
+
+        call_command("generate_schedule", start="2025-03-10", days=1, stdout=StringIO())
+
+        sessions = [(s.room_id, s.date_hour, s.date_hour + timedelta(minutes=100)) for s in Session.objects.all()]
+        self.assertGreater(len(sessions), 3)
+        self.assertIn(existing.date_hour, [start for _, start, _ in sessions])
+        self.assertNoOverlap(sessions, timedelta(minutes=15))
+        self.assertEqual(set(Session.objects.values_list("available_seats", flat=True)), {80})
+
+
+class SessionOverlapTests(TestCase):
+    """Sessions of the same room can't overlap."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.movie = create_movie(1, duration=120)
+        cls.room = Room.objects.create(name="Salle 1", capacity=100)
+        cls.other_room = Room.objects.create(name="Salle 2", capacity=100)
+        cls.start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        cls.session = Session.objects.create(movie=cls.movie, room=cls.room, date_hour=cls.start)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def create(self, room, date_hour):
+        return self.client.post(
+            "/api/sessions/", {"movie_id": self.movie.id, "room_id": room.id, "date_hour": date_hour.isoformat()}
+        )
+
+    def test_overlapping_session_is_rejected(self):
+        for offset in (-119, 0, 60, 119):
+            with self.subTest(offset=offset):
+                response = self.create(self.room, self.start + timedelta(minutes=offset))
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("date_hour", response.json())
+
+    def test_adjacent_or_other_room_is_accepted(self):
+        self.assertEqual(self.create(self.room, self.start + timedelta(minutes=120)).status_code, 201)
+        self.assertEqual(self.create(self.room, self.start - timedelta(minutes=120)).status_code, 201)
+        self.assertEqual(self.create(self.other_room, self.start).status_code, 201)
+
+    def test_update_ignores_the_session_itself(self):
+        url = f"/api/sessions/{self.session.id}/"
+        later = (self.start + timedelta(minutes=30)).isoformat()
+        self.assertEqual(self.client.patch(url, {"date_hour": later}).status_code, 200)
+
+        Session.objects.create(movie=self.movie, room=self.other_room, date_hour=self.start)
+        self.assertEqual(self.client.patch(url, {"room_id": self.other_room.id}).status_code, 400)
+
+    def test_overlap_check_is_a_single_query(self):
+        candidate = Session(movie=self.movie, room=self.room, date_hour=self.start + timedelta(minutes=60))
+        with self.assertNumQueries(1):
+            self.assertEqual(candidate.overlapping_sessions(), [self.session])
+
+    def test_sessions_follow_the_duration_of_their_movie(self):
+        self.assertEqual(self.session.ends_at, self.start + timedelta(minutes=120))
+        self.movie.duration = 150
+        self.movie.save()
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.ends_at, self.start + timedelta(minutes=150))
+        self.assertEqual(self.create(self.room, self.start + timedelta(minutes=140)).status_code, 400)
+
+
+class SessionBulkTests(TestCase):
+    """POST /api/sessions/bulk/"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.movie = create_movie(1, duration=100)
+        cls.rooms = [Room.objects.create(name=f"Salle {i}", capacity=50 + i) for i in range(3)]
+        cls.start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        cls.existing = Session.objects.create(movie=cls.movie, room=cls.rooms[0], date_hour=cls.start)
+        cls.doomed = Session.objects.create(movie=cls.movie, room=cls.rooms[1], date_hour=cls.start)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def post(self, operations):
+        return self.client.post("/api/sessions/bulk/", operations, format="json")
+
+    def creates(self, count, room):
+        return [
+            {"op": "create", "movie_id": self.movie.id, "room_id": room.id,
+             "date_hour": (self.start + timedelta(days=2, hours=2 * i)).isoformat()}
+            for i in range(count)
+        ]
+
+    def test_applies_every_operation(self):
+        later = (self.start + timedelta(hours=3)).isoformat()
+        response = self.post([
+            {"op": "update", "id": self.existing.id, "date_hour": later},
+            {"op": "delete", "id": self.doomed.id},
+            *self.creates(2, self.rooms[2]),
+        ])
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([r["status"] for r in results], ["updated", "deleted", "created", "created"])
+
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.date_hour.isoformat(), later)
+        self.assertFalse(Session.objects.filter(pk=self.doomed.pk).exists())
+        created = Session.objects.get(pk=results[2]["id"])
+        self.assertEqual((created.room, created.available_seats), (self.rooms[2], 52))
+
+    def test_moving_a_session_keeps_its_taken_seats(self):
+        self.existing.reserve_seats(45)  # 5 left of 50
+        response = self.post([{"op": "update", "id": self.existing.id, "room_id": self.rooms[2].id}])
+        self.assertEqual(response.status_code, 200)
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.room, self.existing.available_seats), (self.rooms[2], 7))
+
+        small = Room.objects.create(name="Petite salle", capacity=40)
+        response = self.post([{"op": "update", "id": self.existing.id, "room_id": small.id}])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("room_id", response.json()["results"][0]["errors"])
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.room, self.existing.available_seats), (self.rooms[2], 7))
+
+    def test_query_count_does_not_depend_on_the_batch_size(self):
+        counts = []
+        for room in self.rooms[1:]:
+            operations = self.creates(3 if room == self.rooms[1] else 30, room)
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.post(operations).status_code, 200)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_any_error_rolls_everything_back(self):
+        response = self.post([
+            *self.creates(1, self.rooms[2]),
+            {"op": "create", "movie_id": self.movie.id, "room_id": self.rooms[0].id,
+             "date_hour": (self.start + timedelta(minutes=30)).isoformat()},  # Overlaps `existing`
+            {"op": "delete", "id": 999999},
+        ])
+        self.assertEqual(response.status_code, 400)
+        results = response.json()["results"]
+        self.assertEqual([r["status"] for r in results], ["not_applied", "error", "error"])
+        self.assertIn("date_hour", results[1]["errors"])
+        self.assertIn("id", results[2]["errors"])
+        self.assertEqual(Session.objects.count(), 2)
+
+    def test_malformed_operations_are_reported_per_item(self):
+        response = self.post([*self.creates(1, self.rooms[2]), {"op": "update"}, {"op": "create", "room_id": 1}])
+        self.assertEqual(response.status_code, 400)
+        results = response.json()["results"]
+        self.assertEqual([r["status"] for r in results], ["not_applied", "error", "error"])
+        self.assertEqual(sorted(results[2]["errors"]), ["date_hour", "movie_id"])
+        self.assertEqual(Session.objects.count(), 2)
+
+    def test_overlaps_inside_the_batch_are_rejected(self):
+        operations = self.creates(1, self.rooms[2]) * 2
+        response = self.post(operations)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([r["status"] for r in response.json()["results"]], ["error", "error"])
@@ -0,0 +1,167 @@
+import logging
+import threading
+import time
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+# Atomic token bucket: refill from the elapsed time, then take one token if there is one.
+# Redis' own clock is used so that every web pod shares the same time.
+# Returns {allowed, seconds to wait} (the wait as a string, Lua numbers are truncated to integers).
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call("TIME")
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "ts")
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+local allowed = 0
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = (1 - tokens) / rate
+end
+
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "ts", tostring(now))
+redis.call("EXPIRE", KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(wait)}
+"""
+
+
+class RedisBuckets:
+    """
+    Token buckets stored in Redis, updated atomically by a Lua script.
+    """
+
+    def __init__(self, url):
+        import redis  # Only needed when a Redis server is configured
+
+        self.client = redis.Redis.from_url(url)
+        self.script = self.client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def take(self, key, capacity, rate):
+        allowed, wait = self.script(keys=[key], args=[capacity, rate])
+        return bool(allowed), float(wait)
+
+    def clear(self):
+        """
+        Delete every bucket (the keys of the throttles).
+        """
+        keys = list(self.client.scan_iter(match="throttle:*", count=1000))
+        if keys:
+            self.client.delete(*keys)
+
+
+class MemoryBuckets:
+    """
+    Per-process token buckets, used by the tests and when no Redis server is configured.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = {}  # Key -> (tokens, time of the last refill)
+
+    def take(self, key, capacity, rate):
+        with self.lock:
+            now = time.monotonic()
+            tokens, ts = self.buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - ts) * rate)
+            if tokens >= 1:
+                self.buckets[key] = (tokens - 1, now)
+                return True, 0.0
+            self.buckets[key] = (tokens, now)
+            return False, (1 - tokens) / rate
+
+    def clear(self):
+        with self.lock:
+            self.buckets.clear()
+
+
+def parse_rate(rate):
+    """
+    Parse a DRF rate ("10/min", "5/hour"...) into (requests, seconds).
+    """
+    num, period = rate.split("/")
+    return int(num), {"s": 1, "m": 60, "h": 3600, "d": 86400}[period[0]]
+
+
+# Storage shared by every throttle of the process, created on first use
+_buckets = None
+
+
+def get_buckets():
+    global _buckets
+    if _buckets is None:
+        _buckets = RedisBuckets(settings.THROTTLE_REDIS_URL) if settings.THROTTLE_REDIS_URL else MemoryBuckets()
+    return _buckets
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttle with a token bucket per client and scope.
+
+    The rate of the scope comes from REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"], e.g. "10/min":
+    a client may burst up to 10 requests, then gets one more every 6 seconds.
+    Requests are let through when the bucket storage is unreachable.
+    """
+    scope = None
+
+    def get_ident_key(self, request):
+        """Identify the client, None to skip throttling"""
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        rate = settings.REST_FRAMEWORK.get("DEFAULT_THROTTLE_RATES", {}).get(self.scope)
+        if rate is None:
+            return True
+        capacity, duration = parse_rate(rate)
+
+        ident = self.get_ident_key(request)
+        if ident is None:
+            return True
+        try:
+            allowed, self.retry_after = get_buckets().take(
+                f"throttle:{self.scope}:{ident}", capacity, capacity / duration
+            )
+        except Exception:
+            logger.exception("Throttle storage unavailable")
+            return True
+        return allowed
+
+    def wait(self):
+        return getattr(self, "retry_after", None)
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    """Bucket per client IP address."""
+
+    def get_ident_key(self, request):
+        return f"ip:{self.get_ident(request)}"
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """Bucket per authenticated user, per IP address for anonymous requests."""
+
+    def get_ident_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return f"user:{request.user.pk}"
+        return f"ip:{self.get_ident(request)}"
+
+
+class LoginThrottle(IPTokenBucketThrottle):
+    scope = "login"
+
+
+class RegisterThrottle(IPTokenBucketThrottle):
+    scope = "register"
+
+
+class CheckoutThrottle(UserTokenBucketThrottle):
+    scope = "checkout"
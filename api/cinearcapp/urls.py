@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import async_views, views
 from .views import login_user, get_user_info, register_user
 from rest_framework_simplejwt.views import TokenRefreshView
 
@@ -21,7 +21,8 @@ urlpatterns = [
 
     # Payment-related endpoints
     path("payment/checkout/", views.create_checkout_session, name="create_checkout_session"),  # Create a checkout session
-    path("payment/success/", views.payment_success, name="payment_success"),  # Handle successful payment
+    path("payment/success/", views.payment_success, name="payment_success"),  # State of the last order
+    path("payment/webhook/", views.payment_webhook, name="payment_webhook"),  # Signed payment provider events
     path("payment/cancel/", views.payment_cancel, name="payment_cancel"),  # Handle canceled payment
 
     # Authentication-related endpoints
@@ -29,4 +30,10 @@ urlpatterns = [
     path('auth/user/', get_user_info, name='user_info'),  # Get logged-in user information
     path('auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),  # Refresh JWT token
     path("auth/register/", register_user, name="register_user"),  # User registration endpoint
+
+    # Async read endpoints, served on the event loop under ASGI
+    path("async/movies/", async_views.movie_list, name="async_movie_list"),  # Compact movie list
+    path("async/movies/<int:pk>/", async_views.movie_detail, name="async_movie_detail"),  # Movie details
+    path("async/movies/<int:pk>/sessions/", async_views.movie_sessions, name="async_movie_sessions"),  # Upcoming sessions of a movie
+    path("async/auth/user/", async_views.current_user, name="async_user_info"),  # Logged-in user information
 ]
@@ -1,26 +1,56 @@
+import logging
 import re
 import os
+import secrets
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import action, api_view, authentication_classes, permission_classes, throttle_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.contrib.auth import get_user_model, authenticate
 from rest_framework_simplejwt.tokens import RefreshToken
-from .models import Movie, Room, Session, Basket
+from .models import Movie, Room, Session, Basket, Order, OrderLine, hold_expiry
 from .serializers import UserSerializer, MovieSerializer, RoomSerializer, SessionSerializer, BasketSerializer
+from .serializers import SessionOperationSerializer, BasketLineSerializer
+from .pagination import SessionPagination
+from .search import search_movies
+from .backends import users_by_email
+from .cache import CachedResponseMixin, bump_version
+from .fieldsets import SparseFieldsMixin
+from .routers import ReplicaReadsMixin
+from .throttling import CheckoutThrottle, LoginThrottle, RegisterThrottle
+from .holds import annotate_expired_seats, release_expired_holds
+from .payments import MIN_CHECKOUT_LIFETIME, PaymentError, checkout_idempotency_key, get_payment_provider
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
-import stripe
 from django.conf import settings
-import time
 from django.utils.text import slugify
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, timedelta
+from rest_framework.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+
+logger = logging.getLogger(__name__)
 
 # Get the User model
 User = get_user_model()
 
-# Environment variables for frontend URL and Stripe secret key
+# Environment variable for the frontend URL (payment redirections)
 FRONTEND_URL = os.getenv("FRONTEND_URL")
-stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
+
+# Usernames tried before giving up on a registration
+REGISTER_ATTEMPTS = 5
+
+# Webhook events handled by payment_webhook, with the order transition they trigger
+PAYMENT_EVENTS = {
+    "checkout.session.completed": "paid",
+    "checkout.session.async_payment_succeeded": "paid",
+    "checkout.session.expired": "canceled",
+}
+
+# Error of a session moved to a room too small for the tickets already taken
+ROOM_TOO_SMALL = "Cette salle est trop petite pour les billets déjà réservés de la séance."
 
 # =======================
 # VIEWSETS
@@ -42,29 +72,148 @@ class UserViewSet(viewsets.ModelViewSet):
         user.set_password(user.password)
         user.save()
 
-class MovieViewSet(viewsets.ModelViewSet):
+class MovieViewSet(SparseFieldsMixin, CachedResponseMixin, ReplicaReadsMixin, viewsets.ModelViewSet):
     """
     CRUD operations for movies.
+
+    `?q=` searches the titles and synopses and returns the most relevant movies
+    first, a single page of them.
+    The list is compact by default, `?fields=` picks other fields (`?fields=all` for all).
     """
-    queryset = Movie.objects.all()
+    queryset = Movie.objects.prefetch_related("genres")
     serializer_class = MovieSerializer
+    list_fields = MovieSerializer.compact_fields
     permission_classes = [permissions.AllowAny]
+    cache_tables = ("movie",)
+    searching = False
+
+    def paginate_queryset(self, queryset):
+        text = self.request.query_params.get("q", "").strip()
+        if self.action != "list" or not text:
+            return super().paginate_queryset(queryset)
+        # Ranked results don't follow the id cursor, only the best page is returned
+        self.searching = True
+        return search_movies(queryset, text, self.paginator.get_page_size(self.request))
+
+    def get_paginated_response(self, data):
+        if self.searching:
+            return Response({"next": None, "previous": None, "results": data})
+        return super().get_paginated_response(data)
 
-class RoomViewSet(viewsets.ModelViewSet):
+    def get_queryset(self):
+        """
+        Filter the movie list on a genre id or name with `?genre=`.
+        """
+        queryset = super().get_queryset()
+        genre = self.request.query_params.get("genre")
+        if self.action == "list" and genre:
+            # Goes through the (genre_id, movie_id) index of the join table
+            lookup = {"genres__id": int(genre)} if genre.isdigit() else {"genres__name": genre}
+            queryset = queryset.filter(**lookup)
+        return queryset
+
+class RoomViewSet(SparseFieldsMixin, CachedResponseMixin, ReplicaReadsMixin, viewsets.ModelViewSet):
     """
     CRUD operations for rooms.
     """
     queryset = Room.objects.all()
     serializer_class = RoomSerializer
     permission_classes = [permissions.AllowAny]
+    cache_tables = ("room",)
 
-class SessionViewSet(viewsets.ModelViewSet):
+class SessionViewSet(SparseFieldsMixin, CachedResponseMixin, ReplicaReadsMixin, viewsets.ModelViewSet):
     """
     CRUD operations for sessions.
+
+    The list can be filtered with the `movie`, `room`, `from` and `to` query
+    parameters. Past sessions are left out unless `from` is given.
+    Listed sessions embed a compact movie and room, `?expand=movie,room` embeds them in full.
     """
-    queryset = Session.objects.all()
+    queryset = Session.objects.select_related("movie", "room").prefetch_related("movie__genres")  # Nested in the serializer
     serializer_class = SessionSerializer
     permission_classes = [permissions.AllowAny]
+    cache_tables = ("session", "movie", "room")  # Sessions embed their movie and room
+    lagging_tables = ("seats",)  # Seat counts change with every booking, the replicas may show them late
+    cache_period = 60  # The default list hides sessions as they start
+    pagination_class = SessionPagination  # Chronological keyset pagination
+
+    def perform_create(self, serializer):
+        """
+        Create the session if its room is free for the whole screening.
+        """
+        with transaction.atomic():
+            check_room_available(serializer)
+            serializer.save()
+
+    def perform_update(self, serializer):
+        """
+        Update the session if its room is free for the whole screening.
+        Moved to another room, the session keeps its taken seats (see seats_in_room).
+        """
+        with transaction.atomic():
+            check_room_available(serializer)
+            # Locked, so the counter written back includes the concurrent bookings
+            current = Session.objects.select_for_update(of=("self",)).select_related("room").get(pk=serializer.instance.pk)
+            room = serializer.validated_data.get("room", current.room)
+            seats = seats_in_room(current, current.room, room)
+            if seats < 0:
+                raise ValidationError({"room_id": ROOM_TOO_SMALL})
+            serializer.save(available_seats=seats)
+
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        """
+        Create, update and delete many sessions in one request and one transaction.
+
+        Body: a list of operations (or {"operations": [...]}) such as
+        {"op": "create", "movie_id": 1, "room_id": 2, "date_hour": "..."},
+        {"op": "update", "id": 5, "date_hour": "..."} or {"op": "delete", "id": 6}.
+        Either every operation is applied, or none is and the errors are reported per item.
+        """
+        payload = request.data.get("operations") if isinstance(request.data, dict) else request.data
+        serializer = SessionOperationSerializer(data=payload, many=True)
+        if not serializer.is_valid():
+            if not isinstance(serializer.errors, list):
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)  # Not a list at all
+            return Response(bulk_results(serializer.errors), status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            results, errors = apply_session_operations(serializer.validated_data)
+            if any(errors):
+                transaction.set_rollback(True)
+                return Response(bulk_results(errors), status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({"results": results})
+
+    def get_queryset(self):
+        """
+        Apply the query parameter filters to the session list.
+        """
+        queryset = super().get_queryset()
+        if self.action == "retrieve":
+            return annotate_expired_seats(queryset)
+        if self.action != "list":
+            return queryset  # Update and delete can reach any session
+
+        params = self.request.query_params
+
+        # Filter on the movie and/or the room (served by the (movie|room, date_hour) indexes)
+        for field in ("movie", "room"):
+            value = params.get(field)
+            if value is not None:
+                if not value.isdigit():
+                    raise ValidationError({field: "Must be an integer id."})
+                queryset = queryset.filter(**{f"{field}_id": int(value)})
+
+        # Date range, defaulting to upcoming sessions only
+        date_from = parse_datetime_param(params, "from") or timezone.now()
+        queryset = queryset.filter(date_hour__gte=date_from)
+
+        date_to = parse_datetime_param(params, "to")
+        if date_to is not None:
+            queryset = queryset.filter(date_hour__lt=date_to)
+
+        return annotate_expired_seats(queryset)
 
 class BasketViewSet(viewsets.ModelViewSet):
     """
@@ -75,81 +224,215 @@ class BasketViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """
-        Retrieve only the baskets of the logged-in user that are not paid.
+        Retrieve only the baskets of the logged-in user that are not paid and still hold their seats.
         """
-        return Basket.objects.filter(user=self.request.user, payed=False)
+        return Basket.objects.held().filter(user=self.request.user).select_related(
+            "user", "session__movie", "session__room"  # Everything nested by BasketSerializer
+        ).prefetch_related("session__movie__genres")
 
     def perform_create(self, serializer):
         """
-        Automatically assign the basket to the logged-in user when an item is added.
+        Automatically assign the basket to the logged-in user when an item is added,
+        reserving the requested seats in the same transaction.
+        """
+        session = serializer.validated_data["session"]
+        try:
+            with transaction.atomic():
+                # An expired line of the same session no longer counts, drop it first
+                release_expired_holds(Basket.objects.filter(user=self.request.user, session=session))
+                reserve_seats_or_fail(session, serializer.validated_data["quantity"])
+                serializer.save(user=self.request.user, held_until=hold_expiry())
+        except IntegrityError:
+            raise ValidationError({"session_id": "Cette séance est déjà dans le panier."})
+
+    @action(detail=False, methods=["post"])
+    def add(self, request):
         """
-        serializer.save(user=self.request.user)
+        Add tickets for a session to the logged-in user's basket in a single call.
+        The unpaid line of the session is created or its quantity incremented in SQL,
+        so concurrent clicks never lose an update nor create a duplicate line.
+        Returns only the changed line, whose seat hold starts again.
+        """
+        serializer = BasketLineSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        session_id, quantity = serializer.validated_data["session_id"], serializer.validated_data["quantity"]
+        lines = Basket.objects.filter(user=request.user, session_id=session_id, payed=False)
+
+        with transaction.atomic():
+            session = get_object_or_404(Session, pk=session_id)
+            release_expired_holds(lines)  # An expired line starts over from zero
+            reserve_seats_or_fail(session, quantity)
+
+            created = False
+            if not lines.update(quantity=F("quantity") + quantity, held_until=hold_expiry()):
+                try:
+                    with transaction.atomic():  # Savepoint, a concurrent request may create the line first
+                        Basket.objects.create(user=request.user, session=session, quantity=quantity)
+                        created = True
+                except IntegrityError:
+                    lines.update(quantity=F("quantity") + quantity, held_until=hold_expiry())
+
+            line = lines.get()
+
+        return Response(
+            BasketLineSerializer(line).data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+    def perform_update(self, serializer):
+        """
+        Move the reserved seats along with a quantity or session change, and renew the hold.
+        """
+        with transaction.atomic():
+            # Lock the basket line so concurrent updates see each other's quantity
+            current = Basket.objects.select_for_update().select_related("session").get(pk=serializer.instance.pk)
+            session = serializer.validated_data.get("session", current.session)
+            quantity = serializer.validated_data.get("quantity", current.quantity)
+
+            if session.pk != current.session_id:
+                current.session.release_seats(current.quantity)
+                reserve_seats_or_fail(session, quantity)
+            elif quantity > current.quantity:
+                reserve_seats_or_fail(session, quantity - current.quantity)
+            elif quantity < current.quantity:
+                session.release_seats(current.quantity - quantity)
+
+            serializer.save(held_until=hold_expiry())
+
+    def perform_destroy(self, instance):
+        """
+        Give the seats back when an unpaid line is removed from the basket.
+        """
+        with transaction.atomic():
+            instance.session.release_seats(instance.quantity)
+            instance.delete()
 
 # =======================
 # PAYMENT
 # =======================
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([CheckoutThrottle])
 def create_checkout_session(request):
     """
-    Create a Stripe session for payment.
+    Create an order from the basket and its checkout session with the configured payment provider.
+    The order snapshots the basket lines, whose seats stay held until the checkout expires.
+    Retrying with an unchanged basket returns the same order and checkout.
     """
     user = request.user  # Get the logged-in user using the token
-
-    # Retrieve unpaid cart items for the user
-    cart_items = Basket.objects.filter(user=user, payed=False).select_related("session")
-
-    if not cart_items.exists():
-        return Response({"error": "No tickets to pay for"}, status=400)
-
-    # Calculate the total amount in CHF
-    total_amount = sum(item.quantity * 16 for item in cart_items)
-
+    now = timezone.now()
+
+    # Retrieve the unpaid cart items of the user whose seats are still held
+    cart_items = Basket.objects.held(now).filter(user=user)
+
+    with transaction.atomic():
+        lines = list(cart_items.values_list("id", "session_id", "quantity", "session__room__price"))
+        if not lines:
+            return Response({"error": "No tickets to pay for"}, status=400)
+        key = checkout_idempotency_key(user, [(line_id, quantity) for line_id, _, quantity, _ in lines])
+
+        # A pending order of the same basket is reused while its checkout can still be sent to the
+        # provider unchanged (a minute more than its minimum lifetime, so the deadline is never
+        # pushed back). The user's other pending orders (older baskets) are replaced by this one.
+        replaced = list(
+            Order.objects.select_for_update()
+            .filter(user=user, status=Order.Status.PENDING)
+            .exclude(idempotency_key=key, expires_at__gt=now + MIN_CHECKOUT_LIFETIME + timedelta(minutes=1))
+            .values_list("pk", "checkout_id")
+        )
+        Order.objects.filter(pk__in=[pk for pk, _ in replaced]).update(status=Order.Status.CANCELED)
+        order, created = Order.objects.get_or_create(
+            idempotency_key=key,
+            status=Order.Status.PENDING,
+            defaults={
+                "user": user,
+                "amount": 0,  # Set from the order lines below
+                "currency": settings.PAYMENT_CURRENCY,
+                "expires_at": now + max(timedelta(minutes=settings.CHECKOUT_EXPIRY_MINUTES), MIN_CHECKOUT_LIFETIME),
+            },
+        )
+        if created:
+            OrderLine.objects.bulk_create([
+                OrderLine(order=order, basket_id=line_id, session_id=session_id, quantity=quantity, unit_price=price)
+                for line_id, session_id, quantity, price in lines
+            ])
+            # Total in centimes, one SQL aggregate over the snapshot just written
+            order.amount = order.lines.aggregate(total=Sum(F("quantity") * F("unit_price")))["total"]
+            order.save(update_fields=["amount"])
+            # Hold the seats for the whole checkout
+            Basket.objects.filter(pk__in=[line[0] for line in lines]).update(held_until=order.expires_at)
+
+    # The provider is called outside the transaction, nothing stays locked while waiting for it
+    provider = get_payment_provider()
+    for _, checkout_id in replaced:
+        # Close the replaced checkouts; one paid anyway is still honored by the webhook
+        if checkout_id:
+            try:
+                provider.expire_checkout(checkout_id)
+            except PaymentError as e:
+                logger.warning("Could not expire the replaced checkout %s: %s", checkout_id, e)
     try:
-        # Create a Stripe checkout session
-        session = stripe.checkout.Session.create(
-            payment_method_types=["card"],
-            line_items=[
-                {
-                    "price_data": {
-                        "currency": "chf",
-                        "product_data": {"name": "Cinema Reservation"},
-                        "unit_amount": total_amount * 100,  # Convert CHF to cents
-                    },
-                    "quantity": 1,
-                }
-            ],
-            mode="payment",
+        checkout = provider.create_checkout(
+            amount=order.amount,
+            currency=order.currency,
+            idempotency_key=f"{order.idempotency_key}-{order.pk}",
             success_url=f"{FRONTEND_URL}/payment/success",
             cancel_url=f"{FRONTEND_URL}/payment/cancel",
+            expires_at=order.expires_at,
+            reference=str(order.pk),
         )
+    except PaymentError as e:
+        return Response({"error": str(e)}, status=502)
 
-        return Response({"checkout_url": session.url})
-
-    except Exception as e:
-        return Response({"error": str(e)}, status=500)
+    if order.checkout_id != checkout.id:
+        Order.objects.filter(pk=order.pk).update(checkout_id=checkout.id)
+    return Response({"checkout_url": checkout.url})
 
 @api_view(['POST'])
+@authentication_classes([])  # Authenticated by the signature of the event
+@permission_classes([AllowAny])
+def payment_webhook(request):
+    """
+    Receive the events of the payment provider (Stripe webhook).
+    A completed checkout marks its order paid and sells the held seats, an expired one
+    cancels the order. Events delivered more than once only take effect the first time.
+    """
+    try:
+        event = get_payment_provider().parse_event(request.body, request.headers.get("Stripe-Signature"))
+    except PaymentError as e:
+        return Response({"error": str(e)}, status=400)
+
+    event_type = event.get("type")
+    if event_type not in PAYMENT_EVENTS:
+        return Response({"message": "Event ignored."})  # Acknowledged so it isn't sent again
+
+    checkout = event.get("data", {}).get("object", {})
+    reference = str(checkout.get("client_reference_id") or "")
+    order = Order.objects.filter(pk=int(reference)).first() if reference.isdigit() else None
+    if order is None:
+        order = Order.objects.filter(checkout_id=checkout.get("id")).first()
+    if order is None:
+        return Response({"error": "Unknown order."}, status=404)
+
+    if PAYMENT_EVENTS[event_type] == "paid":
+        if checkout.get("payment_status") not in ("paid", "no_payment_required"):
+            return Response({"message": "Payment pending."})  # Delayed payment methods, wait for the next event
+        changed = order.mark_paid()
+    else:
+        changed = order.cancel()
+
+    return Response({"message": "Order updated." if changed else "Order already handled."})
+
+@api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
 def payment_success(request):
     """
-    Update the user's basket by setting 'payed' to True after successful payment.
+    Return the state of the user's last order after the redirection from the payment page.
+    Orders are only confirmed by the signed webhook, never by this endpoint.
     """
-    user = request.user  # Get the user from the token
-    
-    try:
-        # Retrieve all unpaid baskets for the user
-        baskets = Basket.objects.filter(user=user)
-        
-        if not baskets.exists():
-            return Response({'message': 'No basket to update.'}, status=404)
-
-        # Update each basket
-        baskets.update(payed=True)
-
-        return Response({'message': 'Payment confirmed, basket updated successfully.'}, status=200)
-    except Exception as e:
-        return Response({'error': str(e)}, status=500)
+    order = Order.objects.filter(user=request.user).order_by("-created_at", "-id").first()
+    if order is None:
+        return Response({'message': 'No order found.'}, status=404)
+    return Response({'order_id': order.pk, 'status': order.status, 'amount': order.amount})
 
 def payment_cancel(request):
     """
@@ -163,6 +446,7 @@ def payment_cancel(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([RegisterThrottle])
 def register_user(request):
     """
     Endpoint to register a new user with password validation.
@@ -175,30 +459,35 @@ def register_user(request):
     if not username or not email or not password:
         return Response({"error": "All fields are required."}, status=status.HTTP_400_BAD_REQUEST)
 
-    # Check if the email already exists
-    if User.objects.filter(email=email).exists():
-        return Response({"error": "A user with this email already exists."}, status=status.HTTP_400_BAD_REQUEST)
-
     # Validate the password
     password_error = is_valid_password(password)
     if password_error:
         return Response({"error": password_error}, status=status.HTTP_400_BAD_REQUEST)
-    
-    # If the username already exists, make it unique (slugified + timestamp)
-    if User.objects.filter(username=username).exists():
-        base = slugify(username)
-        username = f"{base}_{int(time.time())}"
 
-    # Create the user
-    user = User.objects.create_user(username=username, email=email, password=password)
+    # Insert directly, the unique indexes on the email and the username reject duplicates.
+    # A taken username is made unique (slugified + random suffix) and tried again.
+    candidate = username
+    for attempt in range(REGISTER_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                User.objects.create_user(username=candidate, email=email.strip(), password=password)
+            break
+        except IntegrityError:
+            if users_by_email(email).exists():
+                return Response({"error": "A user with this email already exists."}, status=status.HTTP_400_BAD_REQUEST)
+            candidate = f"{slugify(username)[:140] or 'user'}_{secrets.token_hex(3)}"
+    else:
+        return Response({"error": "Could not create the account, please try again."}, status=status.HTTP_409_CONFLICT)
 
     return Response({"message": "Account successfully created. You can now log in."}, status=status.HTTP_201_CREATED)
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([LoginThrottle])
 def login_user(request):
     """
     Endpoint to authenticate a user and return a JWT token.
+    The user is found and checked with a single indexed query on the email.
     """
     email = request.data.get("email")
     password = request.data.get("password")
@@ -206,16 +495,9 @@ def login_user(request):
     if not email or not password:
         return Response({"error": "Email and password are required"}, status=status.HTTP_400_BAD_REQUEST)
 
-    # Check if the user exists
-    try:
-        user = User.objects.get(email=email)
-    except User.DoesNotExist:
-        return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
-
-    # Authenticate using the username since Django uses username by default
-    user = authenticate(username=user.username, password=password)
+    user = authenticate(request, email=email, password=password)
     if user is None:
-        return Response({"error": "Incorrect password"}, status=status.HTTP_401_UNAUTHORIZED)
+        return Response({"error": "Incorrect email or password"}, status=status.HTTP_401_UNAUTHORIZED)
 
     # Generate a JWT token using SimpleJWT
     refresh = RefreshToken.for_user(user)
@@ -238,6 +520,194 @@ def get_user_info(request):
     user = request.user
     return Response({'id': user.id, 'username': user.username, 'email': user.email, 'is_superuser': user.is_superuser})
 
+def bulk_results(errors):
+    """
+    Per-item response of a rejected bulk request.
+    """
+    return {
+        "results": [
+            {"index": index, "status": "error", "errors": item_errors} if item_errors
+            else {"index": index, "status": "not_applied"}
+            for index, item_errors in enumerate(errors)
+        ]
+    }
+
+def apply_session_operations(operations):
+    """
+    Validate and apply bulk session operations; must run inside a transaction.
+
+    The referenced sessions, movies and rooms are loaded with one query each (the rooms
+    are locked like in check_room_available, the sessions so that their seat counters
+    can move to a new room), overlaps are checked against a single
+    range query over the affected rooms (on their end times), then the changes are written with batched
+    statements. Returns the per-item results and errors; nothing is written when
+    there is any error.
+    """
+    errors = [{} for _ in operations]
+    session_ids = [op["id"] for op in operations if "id" in op]
+    sessions = Session.objects.select_for_update(of=("self",)).select_related("movie").in_bulk(session_ids)
+    movies = Movie.objects.in_bulk({op["movie_id"] for op in operations if "movie_id" in op})
+    room_ids = {op["room_id"] for op in operations if "room_id" in op} | {s.room_id for s in sessions.values()}
+    rooms = Room.objects.select_for_update().in_bulk(room_ids)
+
+    # Final state of every created or updated session: index -> (movie, room_id, start)
+    targets = {}
+    seen = set()
+    for index, op in enumerate(operations):
+        session = sessions.get(op.get("id"))
+        if op["op"] != "create":
+            if session is None:
+                errors[index]["id"] = "Séance introuvable."
+                continue
+            if session.pk in seen:
+                errors[index]["id"] = "Cette séance apparaît plusieurs fois dans la requête."
+                continue
+            seen.add(session.pk)
+        if "movie_id" in op and op["movie_id"] not in movies:
+            errors[index]["movie_id"] = "Film introuvable."
+        if "room_id" in op and op["room_id"] not in rooms:
+            errors[index]["room_id"] = "Salle introuvable."
+        if op["op"] == "update" and not errors[index] and op.get("room_id", session.room_id) != session.room_id:
+            if seats_in_room(session, rooms[session.room_id], rooms[op["room_id"]]) < 0:
+                errors[index]["room_id"] = ROOM_TOO_SMALL
+        if op["op"] != "delete" and not errors[index]:
+            targets[index] = (
+                movies[op["movie_id"]] if "movie_id" in op else session.movie,
+                op.get("room_id", session.room_id if session else None),
+                op.get("date_hour", session.date_hour if session else None),
+            )
+
+    # Overlaps between the targets and the sessions left untouched, room by room
+    ends = {index: start + timedelta(minutes=movie.duration) for index, (movie, _, start) in targets.items()}
+    if targets:
+        existing = (
+            Session.objects.filter(
+                room_id__in={room_id for _, room_id, _ in targets.values()},
+                date_hour__lt=max(ends.values()),
+                ends_at__gt=min(start for _, _, start in targets.values()),
+            )
+            .exclude(pk__in=seen)
+            .values_list("room_id", "date_hour", "ends_at")
+        )
+        intervals = {}
+        for room_id, start, end in existing:
+            intervals.setdefault(room_id, []).append((start, end, None))
+        for index, (movie, room_id, start) in targets.items():
+            intervals.setdefault(room_id, []).append((start, ends[index], index))
+
+        for room_intervals in intervals.values():
+            room_intervals.sort(key=lambda interval: interval[0])
+            furthest_end, furthest_index = None, None
+            for start, end, index in room_intervals:
+                if furthest_end is not None and start < furthest_end:
+                    for culprit in (index, furthest_index):
+                        if culprit is not None:
+                            errors[culprit]["date_hour"] = "La salle est déjà occupée à cette heure."
+                if furthest_end is None or end > furthest_end:
+                    furthest_end, furthest_index = end, index
+
+    if any(errors):
+        return [], errors
+
+    # Apply everything with batched statements
+    created = Session.objects.bulk_create(
+        [
+            Session(
+                movie=movie, room_id=room_id, date_hour=start, ends_at=ends[index], available_seats=rooms[room_id].capacity
+            )
+            for index, (movie, room_id, start) in targets.items() if operations[index]["op"] == "create"
+        ],
+        batch_size=500,
+    )
+    updated = []
+    for index, (movie, room_id, start) in targets.items():
+        if operations[index]["op"] == "update":
+            session = sessions[operations[index]["id"]]
+            if room_id != session.room_id:
+                session.available_seats = seats_in_room(session, rooms[session.room_id], rooms[room_id])
+            session.movie, session.room_id, session.date_hour, session.ends_at = movie, room_id, start, ends[index]
+            updated.append(session)
+    Session.objects.bulk_update(updated, ["movie", "room", "date_hour", "ends_at", "available_seats"], batch_size=500)
+    deleted = [op["id"] for op in operations if op["op"] == "delete"]
+    Session.objects.filter(pk__in=deleted).delete()
+    bump_version("session")  # Bulk statements don't send signals
+
+    created_ids = iter(session.pk for session in created)
+    statuses = {"create": "created", "update": "updated", "delete": "deleted"}
+    results = [
+        {"index": index, "status": statuses[op["op"]], "id": next(created_ids) if op["op"] == "create" else op["id"]}
+        for index, op in enumerate(operations)
+    ]
+    return results, errors
+
+def seats_in_room(session, old_room, new_room):
+    """
+    Available seats of a session moved from `old_room` to `new_room`: the seats already
+    reserved or sold stay taken. Negative when they don't fit in the new room.
+    """
+    return new_room.capacity - (old_room.capacity - session.available_seats)
+
+def check_room_available(serializer):
+    """
+    Reject a session that overlaps another one in the same room.
+    Must run inside a transaction: the room row stays locked until the session is
+    saved, so two admins can't book the same slot concurrently.
+    """
+    instance = serializer.instance
+    data = serializer.validated_data
+    session = Session(
+        pk=instance.pk if instance else None,
+        movie=data.get("movie", instance.movie if instance else None),
+        room=data.get("room", instance.room if instance else None),
+        date_hour=data.get("date_hour", instance.date_hour if instance else None),
+    )
+
+    # Serialize the writes on this room only
+    Room.objects.select_for_update().get(pk=session.room.pk)
+
+    overlaps = session.overlapping_sessions()
+    if overlaps:
+        other = overlaps[0]
+        start, end = timezone.localtime(other.date_hour), timezone.localtime(other.ends_at)
+        raise ValidationError({
+            "date_hour": f"La salle est déjà occupée par « {other.movie.title} » de {start:%H:%M} à {end:%H:%M}."
+        })
+
+def reserve_seats_or_fail(session, count):
+    """
+    Reserve seats on a session or reject the request when it is sold out.
+    """
+    if session.reserve_seats(count):
+        return
+    # Seats of expired holds may not have been swept yet
+    if not (release_expired_holds(Basket.objects.filter(session=session)) and session.reserve_seats(count)):
+        raise ValidationError({"quantity": "Il ne reste plus assez de places pour cette séance."})
+
+def parse_datetime_param(params, name):
+    """
+    Parse an ISO date or datetime query parameter.
+    A bare date means midnight, naive values use the current timezone.
+    Returns None when the parameter is absent.
+    """
+    value = params.get(name)
+    if not value:
+        return None
+
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            parsed = datetime.combine(day, datetime.min.time()) if day else None
+    except ValueError:
+        parsed = None  # Well formatted but invalid (e.g. month 13)
+
+    if parsed is None:
+        raise ValidationError({name: "Must be an ISO 8601 date or datetime."})
+
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
 def is_valid_password(password):
     """
     Check if the password meets the following criteria:
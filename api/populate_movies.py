@@ -1,70 +1,56 @@
 import os
+from collections import Counter
 import django
-import requests
-from datetime import datetime
 
 # Configuration de Django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cinearc.settings')
 django.setup()
 
-from cinearcapp.models import Movie
-
-# Clé API TMDB et URL
+# Clé API TMDB, utilisée par les fonctions de synchronisation si l'environnement n'en fournit pas
 TMDB_API_KEY = 'a659f5bf4363e91056c093da0b3c3372'
-TMDB_NOW_PLAYING_URL = 'https://api.themoviedb.org/3/movie/now_playing'
-
+os.environ.setdefault('TMDB_API_KEY', TMDB_API_KEY)
 
-def fetch_now_playing_movies(api_key, number_of_movies=10):
-    """Récupère les films actuellement en salle (jusqu'à 10)."""
-    params = {
-        'api_key': api_key,
-        'language': 'fr-FR',
-        'page': 1,
-        'region': 'CH'
-    }
-    response = requests.get(TMDB_NOW_PLAYING_URL, params=params)
-    response.raise_for_status()
-    data = response.json()
-    return data['results'][:number_of_movies]
+from django.db import transaction
+from cinearcapp.ingestion import set_movie_genres, upsert_movies
+from cinearcapp.tasks import TMDB_MAX_PAGES, TMDB_NOW_PLAYING_URL, get_genre_mapping, prepare_movies, tmdb_get
 
 
-def add_movies_to_db(movies):
-    """Ajoute les films récupérés dans la base de données."""
-    for movie in movies:
-        try:
-            title = movie.get('title', 'Titre Inconnu')
-            synopsis = movie.get('overview', '')[:100]  # Limité à 100 caractères
-            duration = movie.get('runtime') or 90  # Valeur par défaut si manquante
-            type_movie = ', '.join(str(g) for g in movie.get('genre_ids', []))
-            release_date = datetime.strptime(movie.get('release_date', '2000-01-01'), "%Y-%m-%d").date()
-            picture_url = f"https://image.tmdb.org/t/p/w500{movie.get('poster_path')}" if movie.get('poster_path') else ''
-            rating = int(movie.get('vote_average', 0))
-            api_id = movie.get('id')
+def fetch_now_playing_movies():
+    """Récupère tous les films actuellement en salle, page par page."""
+    movies = []
+    page, total_pages = 1, 1
+    while page <= min(total_pages, TMDB_MAX_PAGES):
+        data = tmdb_get(TMDB_NOW_PLAYING_URL, page=page, region='CH')
+        movies.extend(data['results'])
+        total_pages = data.get('total_pages', 1)
+        page += 1
+    return movies
 
-            # Vérification de l'existence avant insertion
-            if not Movie.objects.filter(api_id=api_id).exists():
-                Movie.objects.create(
-                    title=title,
-                    synopsis=synopsis,
-                    duration=duration,
-                    type=type_movie,
-                    release_date=release_date,
-                    picture_url=picture_url,
-                    rating=rating,
-                    api_id=api_id
-                )
-                print(f"Film ajouté : {title}")
-            else:
-                print(f"Film déjà présent : {title}")
 
-        except Exception as e:
-            print(f"Erreur lors de l'ajout du film {title}: {str(e)}")
+def add_movies_to_db(movies):
+    """
+    Ajoute ou met à jour les films récupérés dans la base de données.
+    Les films sont construits comme par la synchronisation Celery (synopsis, genres,
+    durée, empreinte du contenu), pour que la prochaine synchronisation ne les réécrive pas.
+    """
+    genre_mapping = get_genre_mapping()
+    to_store, genres_by_movie, counts = prepare_movies(movies, genre_mapping)
+    counts = Counter(counts)
+
+    # Insertion / mise à jour groupée, en une seule transaction
+    with transaction.atomic():
+        counts.update(upsert_movies(to_store))
+        set_movie_genres(genres_by_movie)
+    print(
+        f"Films ajoutés : {counts['inserted']}, mis à jour : {counts['updated']}, "
+        f"inchangés : {counts['unchanged']}, ignorés : {counts['skipped']}"
+    )
 
 
 def main():
     print("Récupération des films en cours...")
     try:
-        movies = fetch_now_playing_movies(TMDB_API_KEY)
+        movies = fetch_now_playing_movies()
         print(f"{len(movies)} films récupérés. Ajout en base de données...")
         add_movies_to_db(movies)
         print("Population de la base terminée.")
@@ -0,0 +1,180 @@
+"""
+Load benchmark of the read endpoints under WSGI (gunicorn, threads) and ASGI (uvicorn),
+on a generated catalog in a temporary SQLite database.
+
+Each scenario keeps `concurrency` keep-alive connections busy for `seconds` and reports
+requests per second and latency percentiles. Needs gunicorn and uvicorn:
+    pip install gunicorn uvicorn
+
+Usage (from the `api/` directory):
+    python scripts/benchmark_asgi.py [concurrency] [seconds] [workers]
+"""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import django
+
+CONCURRENCY = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+SECONDS = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+WORKERS = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+THREADS = 8  # Per gunicorn worker
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+directory = tempfile.TemporaryDirectory()
+
+# Settings of the servers: the temporary database, any host, no debug
+with open(os.path.join(directory.name, "benchmark_settings.py"), "w") as settings_file:
+    settings_file.write(
+        "from cinearc.settings import *  # noqa\n"
+        f"DATABASES['default']['NAME'] = {os.path.join(directory.name, 'benchmark.sqlite3')!r}\n"
+        "ALLOWED_HOSTS = ['*']\n"
+        "DEBUG = False\n"
+    )
+os.environ["DJANGO_SETTINGS_MODULE"] = "benchmark_settings"
+os.environ.setdefault("DJANGO_SECRET_KEY", "benchmark-secret-key-long-enough-for-hs256")
+os.environ.setdefault("TMDB_API_KEY", "benchmark")
+os.environ["PYTHONPATH"] = os.pathsep.join([directory.name, API_DIR])
+sys.path[:0] = [directory.name, API_DIR]
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework_simplejwt.tokens import RefreshToken  # noqa: E402
+from cinearcapp.models import Genre, Movie, Room, Session  # noqa: E402
+
+call_command("migrate", verbosity=0)
+genres = Genre.objects.bulk_create([Genre(api_id=i, name=f"Genre {i}") for i in range(10)])
+rooms = Room.objects.bulk_create([Room(name=f"Salle {i}", capacity=120) for i in range(10)])
+movies = Movie.objects.bulk_create([
+    Movie(
+        api_id=i,
+        title=f"Film numéro {i}",
+        synopsis="Une histoire de cinéma. " * 20,
+        duration=120,
+        type="Action, Drame",
+        release_date=date(2024, 1, 1),
+        picture_url=f"https://image.tmdb.org/t/p/w500/poster{i}.jpg",
+        rating=7,
+    )
+    for i in range(500)
+])
+for i, movie in enumerate(movies):
+    movie.genres.set(genres[i % 10:i % 10 + 2])
+start = timezone.now() + timedelta(days=1)
+Session.objects.bulk_create([
+    Session(
+        movie=movies[i % 500],
+        room=rooms[i % 10],
+        date_hour=start + timedelta(minutes=15 * i),
+        ends_at=start + timedelta(minutes=15 * i + 120),
+        available_seats=120,
+    )
+    for i in range(5000)
+])
+user = get_user_model().objects.create_user(username="buyer", email="buyer@example.com", password="benchmark!123")
+token = str(RefreshToken.for_user(user).access_token)
+movie_id = movies[0].id
+
+SERVERS = {
+    "WSGI": ["gunicorn", "cinearc.wsgi:application", "-k", "gthread", "-w", str(WORKERS), "--threads", str(THREADS)],
+    "ASGI": ["uvicorn", "cinearc.asgi:application", "--workers", str(WORKERS), "--no-access-log", "--log-level", "warning"],
+}
+SCENARIOS = [
+    ("movie list", "WSGI", "/api/movies/"),
+    ("movie list", "ASGI", "/api/movies/"),
+    ("movie list", "ASGI", "/api/async/movies/"),
+    ("movie sessions", "WSGI", f"/api/sessions/?movie={movie_id}"),
+    ("movie sessions", "ASGI", f"/api/async/movies/{movie_id}/sessions/"),
+    ("current user", "WSGI", "/api/auth/user/"),
+    ("current user", "ASGI", "/api/async/auth/user/"),
+]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(kind):
+    port = free_port()
+    bind = ["--bind", f"127.0.0.1:{port}"] if kind == "WSGI" else ["--host", "127.0.0.1", "--port", str(port)]
+    process = subprocess.Popen(SERVERS[kind] + bind, cwd=API_DIR, stdout=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return process, port
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"{kind} server did not start")
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    length = 0
+    for line in head.split(b"\r\n"):
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":", 1)[1])
+    await reader.readexactly(length)
+    return status
+
+
+async def client(port, path, deadline, latencies, errors):
+    request = (
+        f"GET {path} HTTP/1.1\r\nHost: localhost\r\nAuthorization: Bearer {token}\r\n\r\n"
+    ).encode()
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            writer.write(request)
+            try:
+                status = await read_response(reader)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                errors.append(0)
+                writer.close()
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                continue
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def load(port, path):
+    latencies, errors = [], []
+    await asyncio.gather(*[client(port, path, time.perf_counter() + 1, [], []) for _ in range(10)])  # Warm up
+    deadline = time.perf_counter() + SECONDS
+    await asyncio.gather(*[client(port, path, deadline, latencies, errors) for _ in range(CONCURRENCY)])
+    return latencies, errors
+
+
+print(f"{CONCURRENCY} connections, {SECONDS:.0f} s per scenario, {WORKERS} workers")
+for kind in SERVERS:
+    process, port = start_server(kind)
+    try:
+        for label, server, path in SCENARIOS:
+            if server != kind:
+                continue
+            latencies, errors = asyncio.run(load(port, path))
+            latencies.sort()
+            percentile = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000  # noqa: E731
+            print(
+                f"{label:>15} {kind} {path:<32} {len(latencies) / SECONDS:8.0f} req/s  "
+                f"p50 {percentile(0.5):7.1f} ms  p99 {percentile(0.99):7.1f} ms  errors {len(errors)}"
+            )
+    finally:
+        process.terminate()
+        process.wait()
+
+directory.cleanup()
@@ -0,0 +1,75 @@
+"""
+Benchmark of the movie search on a generated catalog, in a temporary SQLite database.
+
+Usage (from the `api/` directory):
+    python scripts/benchmark_movie_search.py [number_of_movies]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date
+
+import django
+
+NUMBER_OF_MOVIES = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "cinearc.settings")
+os.environ.setdefault("DJANGO_SECRET_KEY", "benchmark")
+os.environ.setdefault("TMDB_API_KEY", "benchmark")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+
+# Never touch the development database
+directory = tempfile.TemporaryDirectory()
+settings.DATABASES["default"]["NAME"] = os.path.join(directory.name, "benchmark.sqlite3")
+call_command("migrate", verbosity=0)
+
+from cinearcapp.ingestion import upsert_movies  # noqa: E402
+from cinearcapp.models import Movie  # noqa: E402
+from cinearcapp.search import search_movies  # noqa: E402
+
+# French-looking vocabulary: real words and generated ones, used with a Zipf-like frequency
+WORDS = (
+    "amour nuit destin dernier voyage retour secret guerre étoile île mémoire ombre lumière ville "
+    "océan frère sœur enfant légende chasseur royaume silence tempête été hiver éternel château "
+    "mystère fantôme rêve soleil lune désert forêt cœur promesse vérité mensonge révolution"
+).split()
+SYLLABLES = "ba be bi bo cha che cla co da de di do fa fe fi la le li lo ma me mi mo na ne ni no pa pe ra re ri ro sa se si so ta te ti to va ve vi".split()
+
+random.seed(42)
+WORDS += ["".join(random.choices(SYLLABLES, k=random.randint(2, 4))) for _ in range(20_000)]
+WEIGHTS = [1 / rank for rank in range(1, len(WORDS) + 1)]
+
+movies = [
+    Movie(
+        api_id=index,
+        title=" ".join(random.choices(WORDS, WEIGHTS, k=random.randint(2, 4))).capitalize(),
+        synopsis=" ".join(random.choices(WORDS, WEIGHTS, k=25)),
+        duration=random.randint(80, 180),
+        type="",
+        release_date=date(2000 + index % 25, 1, 1),
+        picture_url="",
+        rating=random.randint(1, 10),
+    )
+    for index in range(1, NUMBER_OF_MOVIES + 1)
+]
+started = time.perf_counter()
+upsert_movies(movies)
+print(f"{NUMBER_OF_MOVIES} movies indexed in {time.perf_counter() - started:.1f} s")
+
+queryset = Movie.objects.all()
+for text in ("revolution", "chateau fantome", "promesse verite", "revolutoin", "mensonge promese", "zzz"):
+    search_movies(queryset, text, 20)  # Warm up
+    runs = 20
+    started = time.perf_counter()
+    for _ in range(runs):
+        results = search_movies(queryset, text, 20)
+    elapsed = (time.perf_counter() - started) / runs
+    print(f"{text!r:>26}: {elapsed * 1000:6.1f} ms, {len(results)} results, first: {results[0].title if results else '-'}")
+
+directory.cleanup()
@@ -0,0 +1,89 @@
+"""
+Benchmark of the session list serialization and rendering, in a temporary SQLite database.
+
+Compares DRF's ListSerializer + JSONRenderer with the read-only list path + orjson, on
+full and compact sessions. The rows are loaded once, only serializing and rendering is timed.
+
+Usage (from the `api/` directory):
+    python scripts/benchmark_serialization.py [number_of_sessions]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import django
+
+NUMBER_OF_SESSIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "cinearc.settings")
+os.environ.setdefault("DJANGO_SECRET_KEY", "benchmark")
+os.environ.setdefault("TMDB_API_KEY", "benchmark")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+
+# Never touch the development database
+directory = tempfile.TemporaryDirectory()
+settings.DATABASES["default"]["NAME"] = os.path.join(directory.name, "benchmark.sqlite3")
+call_command("migrate", verbosity=0)
+
+from django.utils import timezone  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+from rest_framework.serializers import ListSerializer  # noqa: E402
+from cinearcapp.models import Genre, Movie, Room, Session  # noqa: E402
+from cinearcapp.renderers import ORJSONRenderer  # noqa: E402
+from cinearcapp.serializers import SessionSerializer  # noqa: E402
+
+genres = Genre.objects.bulk_create([Genre(api_id=i, name=f"Genre {i}") for i in range(10)])
+rooms = Room.objects.bulk_create([Room(name=f"Salle {i}", capacity=120) for i in range(10)])
+movies = Movie.objects.bulk_create([
+    Movie(
+        api_id=i,
+        title=f"Film numéro {i}",
+        synopsis="Une histoire de cinéma. " * 20,
+        duration=120,
+        type="Action, Drame",
+        release_date=date(2024, 1, 1),
+        picture_url=f"https://image.tmdb.org/t/p/w500/poster{i}.jpg",
+        rating=7,
+    )
+    for i in range(200)
+])
+for i, movie in enumerate(movies):
+    movie.genres.set(genres[i % 10:i % 10 + 2])
+start = timezone.now()
+Session.objects.bulk_create([
+    Session(
+        movie=movies[i % 200],
+        room=rooms[i % 10],
+        date_hour=start + timedelta(minutes=15 * i),
+        ends_at=start + timedelta(minutes=15 * i + 120),
+        available_seats=120,
+    )
+    for i in range(NUMBER_OF_SESSIONS)
+])
+sessions = list(Session.objects.select_related("movie", "room").prefetch_related("movie__genres"))
+
+
+def measure(serializer, renderer, runs=5):
+    renderer.render(serializer().data)  # Warm up
+    started = time.perf_counter()
+    for _ in range(runs):
+        body = renderer.render(serializer().data)
+    return (time.perf_counter() - started) / runs, len(body)
+
+
+print(f"{NUMBER_OF_SESSIONS} sessions")
+for label, expand in (("full", None), ("compact", [])):
+    current = measure(lambda: ListSerializer(sessions, child=SessionSerializer(expand=expand)), JSONRenderer())
+    fast = measure(lambda: SessionSerializer(sessions, many=True, expand=expand), ORJSONRenderer())
+    print(
+        f"{label:>8}: DRF + json {current[0] * 1000:7.1f} ms, fast path + orjson {fast[0] * 1000:7.1f} ms "
+        f"(x{current[0] / fast[0]:.1f}), {fast[1] / 1024:.0f} kB"
+    )
+
+directory.cleanup()
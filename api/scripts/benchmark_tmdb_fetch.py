@@ -0,0 +1,81 @@
+"""
+Benchmark of the TMDB detail fetching against a local fake TMDB server.
+
+Compares the former ingestion path (one bare `requests.get` per movie, one after
+the other) with the pooled, concurrent `fetch_movie_runtimes`.
+
+Usage (from the `api/` directory):
+    python scripts/benchmark_tmdb_fetch.py [number_of_movies] [latency_ms]
+"""
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import django
+import requests
+
+NUMBER_OF_MOVIES = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+LATENCY = (int(sys.argv[2]) if len(sys.argv) > 2 else 50) / 1000  # Simulated TMDB response time
+
+
+class FakeTMDBHandler(BaseHTTPRequestHandler):
+    """Answer /movie/<id> with a runtime after a fixed latency, over keep-alive HTTP/1.1."""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        time.sleep(LATENCY)
+        movie_id = self.path.split("?")[0].rstrip("/").split("/")[-1]
+        body = json.dumps({"id": int(movie_id), "runtime": 100}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Keep the benchmark output readable
+
+
+# Start the fake TMDB server on a free local port
+server = ThreadingHTTPServer(("127.0.0.1", 0), FakeTMDBHandler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+
+# Point the ingestion at the fake server before loading it
+os.environ["TMDB_API_URL"] = f"http://127.0.0.1:{server.server_port}"
+os.environ.setdefault("TMDB_API_KEY", "benchmark")
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "cinearc.settings")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+django.setup()
+
+from cinearcapp.tasks import TMDB_MAX_WORKERS, TMDB_MOVIE_DETAILS_URL, fetch_movie_runtimes  # noqa: E402
+
+movie_ids = list(range(1, NUMBER_OF_MOVIES + 1))
+
+
+def sequential():
+    """Former path: a new connection and a blocking request per movie."""
+    return {
+        movie_id: requests.get(TMDB_MOVIE_DETAILS_URL.format(movie_id=movie_id), params={"api_key": "x"}).json()["runtime"]
+        for movie_id in movie_ids
+    }
+
+
+def pooled():
+    """New path: keep-alive connection pool and bounded concurrency."""
+    return fetch_movie_runtimes(movie_ids)
+
+
+print(f"{NUMBER_OF_MOVIES} movies, {LATENCY * 1000:.0f} ms simulated latency, {TMDB_MAX_WORKERS} workers")
+timings = {}
+for name, run in (("sequential", sequential), ("pooled", pooled)):
+    start = time.perf_counter()
+    result = run()
+    timings[name] = time.perf_counter() - start
+    assert len(result) == NUMBER_OF_MOVIES
+    print(f"{name:>10}: {timings[name]:.2f} s ({NUMBER_OF_MOVIES / timings[name]:.0f} movies/s)")
+
+print(f"   speed-up: x{timings['sequential'] / timings['pooled']:.1f}")
+server.shutdown()
@@ -0,0 +1,15 @@
+import axios from "axios";
+
+// Fetch every page of a cursor-paginated list endpoint and return the concatenated results
+export async function fetchAllPages(url, config = {}) {
+  const results = [];
+  let response = await axios.get(url, config);
+
+  while (true) {
+    results.push(...response.data.results);
+    if (!response.data.next) return results;
+
+    // The `next` link already carries the cursor and the original query parameters
+    response = await axios.get(response.data.next, { headers: config.headers });
+  }
+}